@@ -1,12 +1,14 @@
 import ast
+import collections
 import csv
+import hashlib
 import os
 import pkgutil
 import json
 
 from BaseClasses import MultiWorld, Item
 from enum import IntEnum
-from typing import Optional, List, TYPE_CHECKING, Union, get_args, get_origin, Any
+from typing import Callable, Optional, List, NamedTuple, TYPE_CHECKING, Union, get_args, get_origin, Any
 from types import GenericAlias
 from worlds.AutoWorld import World
 from .hooks.Helpers import before_is_category_enabled, before_is_item_enabled, before_is_location_enabled
@@ -26,6 +28,17 @@ def load_data_file(*args) -> dict:
 
     return filedata
 
+def hash_data_files(*fnames: str) -> str:
+    """Hash the raw content of some of the files in the data folder, a missing file is hashed as empty"""
+    data_hash = hashlib.sha256()
+    for fname in fnames:
+        try:
+            data_hash.update(pkgutil.get_data(__name__, "/".join(["data", fname])) or b"")
+        except OSError:
+            pass
+        data_hash.update(b"\0")
+    return data_hash.hexdigest()
+
 def load_data_csv(*args) -> list[dict]:
     fname = "/".join(["data", *args])
 
@@ -37,6 +50,40 @@ def load_data_csv(*args) -> list[dict]:
 
     return filedata
 
+class ItemCounts(collections.Counter):
+    """Counter of item names that keeps track of how many times it has been modified in its version,
+    so compiled rules can tell when the item counts they used got changed."""
+    version: int = 0
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.version += 1
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def pop(self, *args):
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        # Counter.update skips __setitem__ and goes straight to dict.update when the counter is empty
+        super().update(*args, **kwargs)
+        self.version += 1
+
 def is_option_enabled(multiworld: MultiWorld, player: int, name: str) -> bool:
     return get_option_value(multiworld, player, name) > 0
 
@@ -123,6 +170,81 @@ def _is_manualobject_enabled(multiworld: MultiWorld, player: int, object: Any) -
 
     return enabled
 
+class GenerationPlan(NamedTuple):
+    """The parts of the item pool and regions creation that only depend on the options,
+    shared by every player of a multiworld with the same plan options, see get_generation_plan_key."""
+    items_config: dict[str, int]
+    traps: list[str]
+    region_locations: dict[str, list[str]]
+
+def get_generation_plan_option_names(extra_option_names: list[str]) -> list[str]:
+    """Return the names of the options a generation plan depends on: every option used as a yaml_option
+    by the categories, items or locations, and the extra ones asked for by the hooks."""
+    from .Data import category_table, item_table, location_table
+    option_names = set(extra_option_names)
+    for data in [*category_table.values(), *item_table, *location_table]:
+        for option_name in data.get("yaml_option", []):
+            option_names.add(format_to_valid_identifier(option_name.removeprefix("!")))
+    return sorted(option_names)
+
+def normalize_option_value(value: Any) -> Any:
+    """Turn an option value into something hashable that compares equal for equal values"""
+    if isinstance(value, (set, frozenset)):
+        return frozenset(normalize_option_value(v) for v in value)
+    if isinstance(value, dict):
+        return frozenset((k, normalize_option_value(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(normalize_option_value(v) for v in value)
+    return value
+
+def get_generation_plan_key(multiworld: MultiWorld, player: int, option_names: list[str]) -> tuple:
+    return tuple(normalize_option_value(get_option_value(multiworld, player, name)) for name in option_names)
+
+def build_generation_plan(world: World) -> GenerationPlan:
+    """Run the yaml_option checks of the items and locations for the world's player"""
+    from .Game import filler_item_name
+    items_config: dict[str, int] = {}
+    traps: list[str] = []
+    for name in world.item_id_to_name.values():
+        if name == "__Victory__": continue
+        if name == filler_item_name: continue # intentionally using the Game.py filler_item_name here because it's a non-Items item
+
+        item = world.item_name_to_item[name]
+        item_count = int(item.get("count", 1))
+
+        if item.get("trap"):
+            traps.append(name)
+
+        if "category" in item:
+            if not is_item_enabled(world.multiworld, world.player, item):
+                item_count = 0
+
+        items_config[name] = item_count
+
+    region_locations: dict[str, list[str]] = {}
+    for location in world.location_table:
+        if "region" in location and is_location_enabled(world.multiworld, world.player, location):
+            region_locations.setdefault(location["region"], []).append(location["name"])
+
+    return GenerationPlan(items_config, traps, region_locations)
+
+def _passthrough_hook(value, *args):
+    return value
+
+def is_passthrough_hook(hook: Callable) -> bool:
+    """Check if a hook does nothing but return its first argument, like the default hooks do,
+    so callers can skip calling it on hot paths."""
+    code = getattr(hook, "__code__", None)
+    return code is not None and code.co_code == _passthrough_hook.__code__.co_code
+
+def _noop_hook(*args):
+    pass
+
+def is_noop_hook(hook: Callable) -> bool:
+    """Check if a hook does nothing at all, like the default after_collect_item and after_remove_item do"""
+    code = getattr(hook, "__code__", None)
+    return code is not None and code.co_code == _noop_hook.__code__.co_code
+
 def get_items_for_player(multiworld: MultiWorld, player: int, includePrecollected: bool = False) -> List[Item]:
     """Return list of items of a player including placed items"""
     items = [i for i in multiworld.get_items() if i.player == player]
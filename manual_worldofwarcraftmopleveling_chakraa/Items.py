@@ -1,6 +1,7 @@
 from BaseClasses import Item
 from .Data import item_table
 from .Game import filler_item_name, starting_index
+from .Helpers import format_state_prog_items_key, ProgItemsCat
 
 
 ######################
@@ -10,6 +11,7 @@ from .Game import filler_item_name, starting_index
 item_id_to_name: dict[int, str] = {}
 item_name_to_item: dict[str, dict] = {}
 item_name_groups: dict[str, str] = {}
+item_categories: set[str] = set()
 advancement_item_names: set[str] = set()
 lastItemId = -1
 
@@ -49,6 +51,7 @@ for item in item_table:
         if c not in item_name_groups:
             item_name_groups[c] = []
         item_name_groups[c].append(item_name)
+        item_categories.add(c)
 
     #Just lowercase the values here to remove all the .lower.strip down the line
     item['value'] = {k.lower().strip(): v
@@ -63,6 +66,20 @@ for item in item_table:
 item_id_to_name[None] = "__Victory__"
 item_name_to_id = {name: id for id, name in item_id_to_name.items()}
 
+# Index of the categories used by |@Category:N| requires, the value groups of item_name_groups are left out
+category_name_to_item_names: dict[str, tuple[str, ...]] = {c: tuple(item_name_groups[c]) for c in item_categories}
+# Position of every item in the ManualProgress counts kept for each state, see Rules.py
+item_name_to_ordinal: dict[str, int] = {item["name"]: ordinal for ordinal, item in enumerate(item_table)}
+# The (state.prog_items key, delta) pairs applied when an item is collected (and reverted when removed):
+# +1 to the running total of each of its categories and the int of each of its Item Values.
+# Items with neither category nor value are left out so collect and remove can skip them entirely.
+item_name_to_state_deltas: dict[str, tuple[tuple[str, int], ...]] = {}
+for item in item_table:
+    deltas = [(format_state_prog_items_key(ProgItemsCat.CATEGORY, c), 1) for c in item.get("category", [])]
+    deltas.extend((format_state_prog_items_key(ProgItemsCat.VALUE, k), int(v)) for k, v in item["value"].items())
+    if deltas:
+        item_name_to_state_deltas[item["name"]] = tuple(deltas)
+
 
 ######################
 # Item classes
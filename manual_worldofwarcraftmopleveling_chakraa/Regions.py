@@ -1,5 +1,5 @@
 from BaseClasses import Entrance, MultiWorld, Region
-from .Helpers import is_category_enabled, is_location_enabled
+from .Helpers import is_category_enabled
 from .Data import region_table
 from .Locations import ManualLocation, location_name_to_location
 from worlds.AutoWorld import World
@@ -22,6 +22,7 @@ regionMap["Manual"] = {
 
 def create_regions(world: World, multiworld: MultiWorld, player: int):
     # Create regions and assign locations to each region
+    region_locations = world.get_generation_plan().region_locations
     for region in regionMap:
         if "connects_to" not in regionMap[region]:
             exit_array = None
@@ -32,11 +33,7 @@ def create_regions(world: World, multiworld: MultiWorld, player: int):
         if not exit_array:
             exit_array = None
 
-        locations = []
-        for location in world.location_table:
-            if "region" in location and location["region"] == region:
-                if is_location_enabled(multiworld, player, location):
-                    locations.append(location["name"])
+        locations = region_locations.get(region, [])
 
         new_region = create_region(world, multiworld, player, region, locations, exit_array)
         multiworld.regions += [new_region]
@@ -1,24 +1,37 @@
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Optional, Callable, Counter, NamedTuple
 from enum import IntEnum
+from functools import lru_cache
 from operator import eq, ge, le
 
 from .Regions import regionMap
 from .hooks import Rules
 from .Helpers import clamp, is_item_enabled, is_option_enabled, get_option_value, convert_string_to_type,\
-    format_to_valid_identifier, format_state_prog_items_key, ProgItemsCat
+    format_to_valid_identifier, format_state_prog_items_key, ProgItemsCat, hash_data_files
 
 from BaseClasses import MultiWorld, CollectionState
-from worlds.AutoWorld import World
+from worlds.AutoWorld import World, LogicMixin
 from worlds.generic.Rules import set_rule, add_rule
 from Options import Choice, Toggle, Range, NamedRange
+import Utils
 
 import re
+import os
+import sys
+import csv
+import json
 import math
+import marshal
+from time import perf_counter
+from array import array
+from collections import deque
+from itertools import islice
+from types import CodeType
 import inspect
 import logging
 
 if TYPE_CHECKING:
     from . import ManualWorld
+    import numpy
 
 class LogicErrorSource(IntEnum):
     INFIX_TO_POSTFIX = 1 # includes more closing parentheses than opening (but not the opposite)
@@ -101,207 +114,1196 @@ def evaluate_postfix(expr: str, location: str) -> bool:
 
     return stack.pop()
 
-def set_rules(world: "ManualWorld", multiworld: MultiWorld, player: int):
-    # this is only called when the area (think, location or region) has a "requires" field that is a string
-    def checkRequireStringForArea(state: CollectionState, area: dict):
-        requires_list = area["requires"]
+requires_token_regex = re.compile(r'\{(\w+)\((.*?)\)\}|(\|[^|]+\|)|\b(AND|OR)\b|([()!01])', re.IGNORECASE)
 
-        # Get the "real" item counts of item in the pool/placed/starting_items
-        items_counts = world.get_item_counts(player, only_progression=True)
+class RequiresParseError(Exception):
+    """Raised while parsing a requires string. It gets turned into the usual logic KeyError once we know which area it came from."""
+    def __init__(self, source: LogicErrorSource):
+        super().__init__(source)
+        self.source = source
 
-        # Preparing some variables for exception messages
-        area_type = "region" if area.get("is_region",False) else "location"
-        area_name = area.get("name", f"unknown with these parameters: {area}")
+class BatchUnsupportedError(Exception):
+    """Raised by RequiresNode.evaluate_batch for the requires that can't be evaluated from item counts alone, eg. functions."""
 
-        if requires_list == "":
-            return True
+def parse_requires_item(item: str) -> tuple[str, str, str]:
+    """Split an |item| or |@category| token into its type, its name and its (still unconverted) count"""
+    require_type = 'category' if '|@' in item else 'item'
+    item = item.lstrip('|@$').rstrip('|')
 
-        def findAndRecursivelyExecuteFunctions(requires_list: str, recursionDepth: int = 0) -> str:
-            found_functions = re.findall(r'\{(\w+)\((.*?)\)\}', requires_list)
-            if found_functions:
-                if recursionDepth > world.rules_functions_maximum_recursion:
-                    raise RecursionError(f'One or more functions in {area_type} "{area_name}"\'s requires looped too many time (maximum recursion is {world.rules_functions_maximum_recursion}) \
-                                         \n    As of this Exception the following function(s) are waiting to run: {[f[0] for f in found_functions]} \
-                                         \n    And the currently processed requires look like this: "{requires_list}"')
-                else:
-                    for item in found_functions:
-                        func_name = item[0]
-                        func_args = item[1].split(",")
-                        if func_args == ['']:
-                            func_args.pop()
-
-                        func = globals().get(func_name)
-
-                        if func is None:
-                            func = getattr(Rules, func_name, None)
-
-                        if not callable(func):
-                            raise ValueError(f'Invalid function "{func_name}" in {area_type} "{area_name}".')
-
-                        convert_req_function_args(state, func, func_args, area_name)
-                        try:
-                            result = func(*func_args)
-                        except Exception as ex:
-                            raise RuntimeError(f'A call to the function "{func_name}" in {area_type} "{area_name}"\'s requires raised an Exception. \
-                                                \nUnless it was called by another function, it should look something like "{{{func_name}({item[1]})}}" in {area_type}s.json. \
-                                                \nFull error message: \
-                                                \n\n{type(ex).__name__}: {ex}')
-                        if isinstance(result, bool):
-                            requires_list = requires_list.replace("{" + func_name + "(" + item[1] + ")}", "1" if result else "0")
-                        else:
-                            requires_list = requires_list.replace("{" + func_name + "(" + item[1] + ")}", str(result))
-
-                requires_list = findAndRecursivelyExecuteFunctions(requires_list, recursionDepth + 1)
-            return requires_list
-
-        requires_list = findAndRecursivelyExecuteFunctions(requires_list)
-
-        # parse user written statement into list of each item
-        for item in re.findall(r'\|[^|]+\|', requires_list):
-            require_type = 'item'
-
-            if '|@' in item:
-                require_type = 'category'
-
-            item_base = item
-            item = item.lstrip('|@$').rstrip('|')
-
-            item_parts = item.split(":")  # type: list[str]
-            item_name = item
-            item_count = "1"
-
-
-            if len(item_parts) > 1:
-                item_name = item_parts[0].strip()
-                item_count = item_parts[1].strip()
-
-            total = 0
-
-            if require_type == 'category':
-                category_items = [item for item in world.item_name_to_item.values() if "category" in item and item_name in item["category"]]
-                category_items_counts = sum([items_counts.get(category_item["name"], 0) for category_item in category_items])
-                if item_count.lower() == 'all':
-                    item_count = category_items_counts
-                elif item_count.lower() == 'half':
-                    item_count = int(category_items_counts / 2)
-                elif item_count.endswith('%') and len(item_count) > 1:
-                    percent = clamp(float(item_count[:-1]) / 100, 0, 1)
-                    item_count = math.ceil(category_items_counts * percent)
-                else:
-                    try:
-                        item_count = int(item_count)
-                    except ValueError as e:
-                        raise ValueError(f"Invalid item count `{item_name}` in {area}.") from e
-
-                for category_item in category_items:
-                    total += state.count(category_item["name"], player)
-
-                    if total >= item_count:
-                        requires_list = requires_list.replace(item_base, "1")
-            elif require_type == 'item':
-                item_current_count = items_counts.get(item_name, 0)
-                if item_count.lower() == 'all':
-                    item_count = item_current_count
-                elif item_count.lower() == 'half':
-                    item_count = int(item_current_count / 2)
-                elif item_count.endswith('%') and len(item_count) > 1:
-                    percent = clamp(float(item_count[:-1]) / 100, 0, 1)
-                    item_count = math.ceil(item_current_count * percent)
-                else:
-                    item_count = int(item_count)
+    item_parts = item.split(":")
+    item_name = item
+    item_count = "1"
 
-                total = state.count(item_name, player)
+    if len(item_parts) > 1:
+        item_name = item_parts[0].strip()
+        item_count = item_parts[1].strip()
+
+    return (require_type, item_name, item_count)
+
+def combine_requires_syntax(operator: str, left: tuple, right: tuple) -> tuple:
+    # AND and OR share the same precedence and are left associative, so a chain of the same operator can be flattened
+    if left[0] == operator:
+        return (operator, left[1] + (right,))
+    return (operator, (left, right))
+
+@lru_cache(maxsize=None)
+def parse_requires_string(requires: str) -> tuple:
+    """Parse a requires string into a nested tuple, without resolving any item count or function.\n
+    Leaves are ("item", name, count), ("category", name, count), ("function", name, args) and ("constant", bool),
+    branches are ("and", children), ("or", children) and ("not", child).\n
+    It follows the same grammar as infix_to_postfix: AND/OR have the same precedence and are evaluated left to right."""
+    tokens = []
+    for func_name, func_args, item, operator, symbol in requires_token_regex.findall(requires):
+        if func_name:
+            tokens.append(("function", func_name, func_args))
+        elif item:
+            tokens.append(parse_requires_item(item))
+        elif operator:
+            tokens.append("&" if operator.upper() == "AND" else "|")
+        elif symbol in ("0", "1"):
+            tokens.append(("constant", symbol == "1"))
+        else:
+            tokens.append(symbol)
+
+    def parse_operand(index: int) -> tuple[tuple, int]:
+        if index >= len(tokens) or tokens[index] in (")", "&", "|"):
+            raise RequiresParseError(LogicErrorSource.EVALUATE_POSTFIX)
+
+        token = tokens[index]
+        if token == "!":
+            operand, index = parse_operand(index + 1)
+            return ("not", operand), index
+        if token == "(":
+            return parse_expression(index + 1, True)
+        return token, index + 1
+
+    def parse_expression(index: int, nested: bool) -> tuple[tuple, int]:
+        expression, index = parse_operand(index)
+        while index < len(tokens):
+            token = tokens[index]
+            if token == ")":
+                if not nested:
+                    raise RequiresParseError(LogicErrorSource.INFIX_TO_POSTFIX)
+                return expression, index + 1
+            if token not in ("&", "|"):
+                raise RequiresParseError(LogicErrorSource.EVALUATE_STACK_SIZE)
+
+            operand, index = parse_operand(index + 1)
+            expression = combine_requires_syntax("and" if token == "&" else "or", expression, operand)
+        # Like infix_to_postfix, a missing closing parenthesis at the end is tolerated
+        return expression, index
+
+    if not tokens:
+        raise RequiresParseError(LogicErrorSource.EVALUATE_STACK_SIZE)
+
+    return parse_expression(0, False)[0]
+
+def get_area_description(area: dict) -> tuple[str, str]:
+    """Returns the type and name of an area (think, location or region) for exception messages"""
+    area_type = "region" if area.get("is_region", False) else "location"
+    area_name = area.get("name", f"unknown with these parameters: {area}")
+    return area_type, area_name
+
+def resolve_relative_count(count: str | float, total: int) -> int:
+    """Convert an 'all', 'half' or percentage (already divided by 100) count to an actual number using the total in the pool"""
+    if count == 'all':
+        return total
+    elif count == 'half':
+        return int(total / 2)
+    return math.ceil(total * count)
+
+class ManualProgress:
+    """Counts of this world's items in a CollectionState, indexed by the ordinals of Items.item_name_to_ordinal,
+    with a bitmask of the items that have been collected at least once.\n
+    It's kept up to date by ManualWorld.collect/remove and it's what the compiled requires check.\n
+    memo holds the last result of the CompiledRules that only depend on those items, see RequiresCompiler.make_rule."""
+    __slots__ = ("counts", "mask", "memo", "memo_epoch")
+
+    def __init__(self, counts: array, mask: int = 0, memo: Optional[dict] = None, memo_epoch: Optional[object] = None):
+        self.counts = counts
+        self.mask = mask
+        self.memo: dict["CompiledRule", bool] = {} if memo is None else memo
+        self.memo_epoch = memo_epoch
+
+    @classmethod
+    def empty(cls, size: int) -> "ManualProgress":
+        return cls(array('H', [0]) * size)
+
+    def copy(self) -> "ManualProgress":
+        return ManualProgress(self.counts[:], self.mask, self.memo.copy(), self.memo_epoch)
+
+    def collect(self, ordinal: int):
+        self.counts[ordinal] += 1
+        self.mask |= 1 << ordinal
+
+    def remove(self, ordinal: int):
+        count = self.counts[ordinal] - 1
+        if count <= 0:
+            count = 0
+            self.mask &= ~(1 << ordinal)
+        self.counts[ordinal] = count
+
+    def forget(self, rules: list["CompiledRule"]):
+        """Drop the memorized results of rules, called when an item they depend on gets collected or removed"""
+        memo = self.memo
+        for rule in rules:
+            memo.pop(rule, None)
+
+class ManualProgressLogic(LogicMixin):
+    manual_progress: dict[int, ManualProgress]
+    # The locations canReachLocation found reachable, forgotten by ManualWorld.collect/remove when the player's items change
+    manual_reachable_locations: dict[int, set[str]]
+
+    def init_mixin(self, parent: MultiWorld):
+        self.manual_progress = {}
+        self.manual_reachable_locations = {}
+
+    def copy_mixin(self, new_state: CollectionState) -> CollectionState:
+        new_state.manual_progress = {player: progress.copy() for player, progress in self.manual_progress.items()}
+        new_state.manual_reachable_locations = {player: locations.copy() for player, locations in self.manual_reachable_locations.items()}
+        return new_state
+
+def get_manual_progress(state: CollectionState, player: int, size: int) -> ManualProgress:
+    """Get the player's ManualProgress in a state, creating it on the first item collected"""
+    progress = state.manual_progress.get(player)
+    if progress is None:
+        progress = state.manual_progress[player] = ManualProgress.empty(size)
+    return progress
+
+class RequiresNode:
+    """Base class of a compiled requires expression. evaluate() is what gets called during fill,
+    with the player's ManualProgress already fetched from the state by the CompiledRule at the root.\n
+    Operands are only evaluated when the result still depends on them, so functions are only called when needed."""
+    __slots__ = ()
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        raise NotImplementedError
+
+    def key(self) -> tuple:
+        """A hashable description of what the node checks, equal for nodes that always give the same result"""
+        raise NotImplementedError
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        """Add the ordinals of the items the result depends on to ordinals.\n
+        Returns False when the result can depend on something else than those items, eg. a function."""
+        return False
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        """Evaluate the node for every row of a states x items counts matrix at once, see evaluate_rules_batch.\n
+        Raises a BatchUnsupportedError when the result doesn't only depend on those counts."""
+        raise NotImplementedError
+
+class ConstantNode(RequiresNode):
+    __slots__ = ("value",)
+
+    def __init__(self, value: bool):
+        self.value = value
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return self.value
+
+    def key(self) -> tuple:
+        return (ConstantNode, self.value)
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        return True
 
-                if total >= item_count:
-                    requires_list = requires_list.replace(item_base, "1")
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        import numpy
+        return numpy.full(counts.shape[0], self.value)
 
-            if total <= item_count:
-                requires_list = requires_list.replace(item_base, "0")
+class ItemNode(RequiresNode):
+    """|Item| or |Item:count|"""
+    __slots__ = ("compiler", "item_name", "ordinal", "count", "threshold")
 
-        requires_list = re.sub(r'\s?\bAND\b\s?', '&', requires_list, 0, re.IGNORECASE)
-        requires_list = re.sub(r'\s?\bOR\b\s?', '|', requires_list, 0, re.IGNORECASE)
+    def __init__(self, compiler: "RequiresCompiler", item_name: str, ordinal: Optional[int], count: int | str | float):
+        self.compiler = compiler
+        self.item_name = item_name
+        self.ordinal = ordinal
+        self.count = count
+        self.threshold = count if isinstance(count, int) else 0
 
-        requires_string = infix_to_postfix("".join(requires_list), area)
-        return (evaluate_postfix(requires_string, area))
+    def resolve_threshold(self, items_counts: Counter[str]):
+        self.threshold = resolve_relative_count(self.count, items_counts.get(self.item_name, 0))
 
-    # this is only called when the area (think, location or region) has a "requires" field that is a dict
-    def checkRequireDictForArea(state: CollectionState, area: dict):
-        canAccess = True
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return progress.counts[self.ordinal] >= self.threshold
 
-        for item in area["requires"]:
-            # if the require entry is an object with "or" or a list of items, treat it as a standalone require of its own
-            if (isinstance(item, dict) and "or" in item and isinstance(item["or"], list)) or (isinstance(item, list)):
-                canAccessOr = True
-                or_items = item
+    def key(self) -> tuple:
+        return (type(self), self.item_name, self.count)
 
-                if isinstance(item, dict):
-                    or_items = item["or"]
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        ordinals.add(self.ordinal)
+        return True
 
-                for or_item in or_items:
-                    or_item_parts = or_item.split(":")
-                    or_item_name = or_item
-                    or_item_count = 1
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        return counts[:, self.ordinal] >= self.threshold
 
-                    if len(or_item_parts) > 1:
-                        or_item_name = or_item_parts[0]
-                        or_item_count = int(or_item_parts[1])
+class RelativeItemNode(ItemNode):
+    """|Item:all|, |Item:half| or |Item:N%|, its threshold is fixed from the item pool by RequiresCompiler.resolve_item_counts"""
+    __slots__ = ()
 
-                    if not state.has(or_item_name, player, or_item_count):
-                        canAccessOr = False
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return progress.counts[self.ordinal] >= self.threshold
 
-                if canAccessOr:
-                    canAccess = True
-                    break
+class StateItemNode(ItemNode):
+    """An item that isn't in items.json (eg. an event item made by a hook), so it's only counted in the state's prog_items"""
+    __slots__ = ()
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return state.count(self.item_name, self.compiler.player) >= self.threshold
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        return False
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        raise BatchUnsupportedError(f'"{self.item_name}" isn\'t in items.json so it has no column in a batch')
+
+class AnyItemNode(RequiresNode):
+    """|ItemA| OR |ItemB| OR ..., tested in one go against the bitmask of collected items"""
+    __slots__ = ("bits",)
+
+    def __init__(self, bits: int):
+        self.bits = bits
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return (progress.mask & self.bits) != 0
+
+    def key(self) -> tuple:
+        return (AnyItemNode, self.bits)
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        ordinals.update(ordinal for ordinal in range(self.bits.bit_length()) if self.bits >> ordinal & 1)
+        return True
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        ordinals = set()
+        self.find_dependencies(ordinals)
+        return (counts[:, sorted(ordinals)] > 0).any(axis=1)
+
+class AllItemsNode(RequiresNode):
+    """|ItemA| AND |ItemB| AND ..., tested in one go against the bitmask of collected items"""
+    __slots__ = ("bits",)
+
+    def __init__(self, bits: int):
+        self.bits = bits
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return (progress.mask & self.bits) == self.bits
+
+    def key(self) -> tuple:
+        return (AllItemsNode, self.bits)
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        ordinals.update(ordinal for ordinal in range(self.bits.bit_length()) if self.bits >> ordinal & 1)
+        return True
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        ordinals = set()
+        self.find_dependencies(ordinals)
+        return (counts[:, sorted(ordinals)] > 0).all(axis=1)
+
+class CategoryNode(RequiresNode):
+    """|@Category| or |@Category:count|, checked against the category's running total kept by ManualWorld.collect/remove"""
+    __slots__ = ("compiler", "category_name", "item_names", "state_key", "count", "threshold")
+
+    def __init__(self, compiler: "RequiresCompiler", category_name: str, item_names: tuple[str, ...], count: int | str | float):
+        self.compiler = compiler
+        self.category_name = category_name
+        self.item_names = item_names
+        self.state_key = format_state_prog_items_key(ProgItemsCat.CATEGORY, category_name)
+        self.count = count
+        self.threshold = count if isinstance(count, int) else 0
+
+    def resolve_threshold(self, items_counts: Counter[str]):
+        self.threshold = resolve_relative_count(self.count, sum(items_counts.get(name, 0) for name in self.item_names))
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return state.prog_items[self.compiler.player][self.state_key] >= self.threshold
+
+    def key(self) -> tuple:
+        return (type(self), self.category_name, self.count)
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        ordinals.update(self.compiler.world.item_name_to_ordinal[name] for name in self.item_names)
+        return True
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        ordinals = [self.compiler.world.item_name_to_ordinal[name] for name in self.item_names]
+        return counts[:, ordinals].sum(axis=1) >= self.threshold
+
+class RelativeCategoryNode(CategoryNode):
+    """|@Category:all|, |@Category:half| or |@Category:N%|, its threshold is fixed from the item pool by RequiresCompiler.resolve_item_counts"""
+    __slots__ = ()
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return state.prog_items[self.compiler.player][self.state_key] >= self.threshold
+
+class ValueNode(RequiresNode):
+    """{ItemValue(value:count)}, checked against the value's running total kept by ManualWorld.collect/remove"""
+    __slots__ = ("compiler", "value_name", "state_key", "threshold", "deltas")
+
+    def __init__(self, compiler: "RequiresCompiler", value_name: str, threshold: int):
+        self.compiler = compiler
+        self.value_name = value_name
+        self.state_key = format_state_prog_items_key(ProgItemsCat.VALUE, value_name)
+        self.threshold = threshold
+        # The ordinal of every item with this value and how much of it they're worth
+        self.deltas = tuple((compiler.world.item_name_to_ordinal[item_name], delta)
+                            for item_name, item_deltas in compiler.world.item_name_to_state_deltas.items()
+                            for key, delta in item_deltas if key == self.state_key)
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return state.prog_items[self.compiler.player][self.state_key] >= self.threshold
+
+    def key(self) -> tuple:
+        return (ValueNode, self.state_key, self.threshold)
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        # after_collect_item hooks can add to a value too, ManualWorld.collect/remove forget every memoized result when they do something
+        ordinals.update(ordinal for ordinal, _ in self.deltas)
+        return True
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        import numpy
+        total = numpy.zeros(counts.shape[0], dtype=counts.dtype)
+        for ordinal, delta in self.deltas:
+            total = total + counts[:, ordinal] * delta
+        return total >= self.threshold
+
+class FunctionNode(RequiresNode):
+    """{Function(args)}, the function is called on every evaluation with its arguments already bound"""
+    __slots__ = ("compiler", "func", "func_name", "func_args", "call", "area", "depth", "results")
+
+    def __init__(self, compiler: "RequiresCompiler", func, func_name: str, func_args: str, area: dict, depth: int):
+        self.compiler = compiler
+        self.func = func
+        self.func_name = func_name
+        self.func_args = func_args
+        self.call = bind_req_function(compiler.world, func, func_args, get_area_description(area)[1])
+        self.area = area
+        self.depth = depth
+        self.results: dict[str, RequiresNode] = {}
+
+    def call_function(self, state: Optional[CollectionState]):
+        try:
+            return self.call(state)
+        except Exception as ex:
+            area_type, area_name = get_area_description(self.area)
+            raise RuntimeError(f'A call to the function "{self.func_name}" in {area_type} "{area_name}"\'s requires raised an Exception. \
+                                \nUnless it was called by another function, it should look something like "{{{self.func_name}({self.func_args})}}" in {area_type}s.json. \
+                                \nFull error message: \
+                                \n\n{type(ex).__name__}: {ex}')
+
+    def expand(self) -> RequiresNode:
+        """Call the function without a state and compile its result, for the functions that never look at it"""
+        result = self.call_function(None)
+        if isinstance(result, bool):
+            return ConstantNode(result)
+        return self.compiler.compile(str(result), self.area, self.depth + 1)
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        result = self.call_function(state)
+
+        if isinstance(result, bool):
+            return result
+
+        # Anything else is a requires string of its own, it only gets compiled the first time we see it
+        result = str(result)
+        node = self.results.get(result)
+        if node is None:
+            node = self.compiler.compile(result, self.area, self.depth + 1)
+            self.results[result] = node
+        return node.evaluate(state, progress)
+
+    def key(self) -> tuple:
+        return (FunctionNode, self.func, self.func_args)
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        raise BatchUnsupportedError(f'the function "{self.func_name}" needs a state to be called')
+
+class PoolMacroNode(RequiresNode):
+    """{OptOne(...)} or {OptAll(...)}, their result only depends on the item pool so they're expanded into a compiled node once.\n
+    Like the relative counts, they're expanded again if world.item_counts_progression changes after set_rules.
+    Only the counts of the expanded requires can change then, so the items it depends on stay the same."""
+    __slots__ = ("function_node", "child", "items_counts", "items_counts_version")
+
+    def __init__(self, function_node: FunctionNode):
+        self.function_node = function_node
+        self.child: Optional[RequiresNode] = None
+        self.items_counts: Optional[Counter[str]] = None
+        self.items_counts_version: Optional[int] = None
+        compiler = function_node.compiler
+        self.resolve_threshold(compiler.world.get_item_counts(compiler.player, only_progression=True))
+
+    def resolve_threshold(self, items_counts: Counter[str]):
+        version = getattr(items_counts, "version", None)
+        if self.child is not None and items_counts is self.items_counts and version == self.items_counts_version:
+            return
+        self.items_counts = items_counts
+        self.items_counts_version = version
+        self.child = self.function_node.expand()
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return self.child.evaluate(state, progress)
+
+    def key(self) -> tuple:
+        return (PoolMacroNode, self.function_node.key())
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        return self.child.find_dependencies(ordinals)
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        return self.child.evaluate_batch(counts)
+
+class NotNode(RequiresNode):
+    __slots__ = ("child",)
+
+    def __init__(self, child: RequiresNode):
+        self.child = child
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return not self.child.evaluate(state, progress)
+
+    def key(self) -> tuple:
+        return (NotNode, self.child.key())
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        return self.child.find_dependencies(ordinals)
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        return ~self.child.evaluate_batch(counts)
+
+class AndNode(RequiresNode):
+    __slots__ = ("children",)
+
+    def __init__(self, children: tuple[RequiresNode, ...]):
+        self.children = children
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        for child in self.children:
+            if not child.evaluate(state, progress):
+                return False
+        return True
+
+    def key(self) -> tuple:
+        return (AndNode, tuple(child.key() for child in self.children))
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        return all(child.find_dependencies(ordinals) for child in self.children)
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        result = self.children[0].evaluate_batch(counts)
+        for child in self.children[1:]:
+            result = result & child.evaluate_batch(counts)
+        return result
+
+class OrNode(RequiresNode):
+    __slots__ = ("children",)
+
+    def __init__(self, children: tuple[RequiresNode, ...]):
+        self.children = children
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        for child in self.children:
+            if child.evaluate(state, progress):
+                return True
+        return False
+
+    def key(self) -> tuple:
+        return (OrNode, tuple(child.key() for child in self.children))
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        return all(child.find_dependencies(ordinals) for child in self.children)
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        result = self.children[0].evaluate_batch(counts)
+        for child in self.children[1:]:
+            result = result | child.evaluate_batch(counts)
+        return result
+
+class RuleStats(NamedTuple):
+    """How many requires got attached to a region, entrance or location, and how many distinct rules they were compiled into"""
+    attached: int
+    unique: int
+
+class CompiledRule:
+    """The access rule attached to a location or an entrance, it fetches the player's ManualProgress once for the whole tree.\n
+    When memoize is set the result is kept in the ManualProgress until one of the items it depends on is collected or removed,
+    so checking it again between two items costs a dict lookup."""
+    __slots__ = ("node", "player", "compiler", "memoize")
+
+    def __init__(self, node: RequiresNode, player: int, compiler: "RequiresCompiler", memoize: bool = False):
+        self.node = node
+        self.player = player
+        self.compiler = compiler
+        self.memoize = memoize
+
+    def __call__(self, state: CollectionState) -> bool:
+        # The relative thresholds are only checked against the item pool here, once per call, so the nodes can just compare
+        compiler = self.compiler
+        if compiler.relative_nodes:
+            compiler.refresh_item_counts()
+
+        progress = state.manual_progress.get(self.player)
+        if progress is None:
+            return self.node.evaluate(state, compiler.empty_progress)
+        if not self.memoize:
+            return self.node.evaluate(state, progress)
+
+        if progress.memo_epoch is not compiler.epoch: # The relative thresholds changed since these results were memorized
+            progress.memo.clear()
+            progress.memo_epoch = compiler.epoch
+
+        result = progress.memo.get(self)
+        if result is None:
+            result = progress.memo[self] = self.node.evaluate(state, progress)
+        return result
+
+class GeneratedNode(RequiresNode):
+    """A RequiresNode tree turned into a flat Python function by RequiresCodeGenerator.\n
+    The nodes it couldn't inline (functions, relative counts, ...) are called through ext."""
+    __slots__ = ("node", "function", "player", "ext")
+
+    def __init__(self, node: RequiresNode, function: Callable, player: int, ext: tuple[Callable, ...]):
+        self.node = node
+        self.function = function
+        self.player = player
+        self.ext = ext
+
+    def evaluate(self, state: CollectionState, progress: ManualProgress) -> bool:
+        return self.function(state, progress, self.player, self.ext)
+
+    def key(self) -> tuple:
+        return self.node.key()
+
+    def find_dependencies(self, ordinals: set[int]) -> bool:
+        return self.node.find_dependencies(ordinals)
+
+    def evaluate_batch(self, counts: "numpy.ndarray") -> "numpy.ndarray":
+        return self.node.evaluate_batch(counts)
+
+# The code objects of the generated rules, by cache file then by source, from the least to the most recently used
+generated_code_cache: dict[str, dict[str, CodeType]] = {}
+# The sources used from each cache file since the last save_generated_rules, and the cache files that got new code since then
+used_generated_sources: dict[str, set[str]] = {}
+new_generated_code: set[str] = set()
+# How many rules a cache file keeps at most, the least recently used ones get dropped past that
+generated_code_cache_size = 8192
+
+def save_generated_rules():
+    """Write the cache files of the generated rules that got new code, called once per generation by ManualWorld.stage_set_rules.\n
+    The new code is merged with what's already in the file, so generations with different options don't keep replacing each other's rules."""
+    for cache_file, sources in used_generated_sources.items():
+        code = generated_code_cache[cache_file]
+        for source in sources: # Move the rules of this generation to the most recently used end
+            code[source] = code.pop(source)
+        if cache_file not in new_generated_code:
+            continue
+
+        for source in list(islice(code, max(0, len(code) - generated_code_cache_size))):
+            del code[source]
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            with open(temp_file, "wb") as f:
+                marshal.dump(code, f)
+            os.replace(temp_file, cache_file)
+        except OSError as ex:
+            logging.warning(f"Could not write the generated rules cache {cache_file}: {ex}")
+    used_generated_sources.clear()
+    new_generated_code.clear()
+
+class RequiresCodeGenerator:
+    """Generate one Python function per distinct compiled requires, with direct lookups in the ManualProgress and state.prog_items.\n
+    The compiled code is kept on disk keyed by the hash of locations.json and regions.json so it's only compiled once per data version,
+    and since it's looked up by its own source a stale cache can only miss, never give the wrong rule."""
+
+    def __init__(self, compiler: "RequiresCompiler"):
+        self.compiler = compiler
+        data_hash = hash_data_files("locations.json", "regions.json")[:16]
+        self.cache_file = Utils.cache_path("manual_rules", f"{format_to_valid_identifier(compiler.world.game)}_{data_hash}.{sys.implementation.cache_tag}.bin")
+        self.code = generated_code_cache.get(self.cache_file)
+        if self.code is None:
+            self.code = generated_code_cache[self.cache_file] = self.load()
+        self.functions: dict[str, Callable] = {}
+
+    def load(self) -> dict[str, CodeType]:
+        try:
+            with open(self.cache_file, "rb") as f:
+                code = marshal.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, EOFError, ValueError, TypeError) as ex:
+            logging.warning(f"Could not read the generated rules cache {self.cache_file}, it will be rebuilt: {ex}")
+            return {}
+        return code if isinstance(code, dict) else {}
+
+    def generate(self, node: RequiresNode) -> RequiresNode:
+        if isinstance(node, ConstantNode):
+            return node
+
+        ext: list[Callable] = []
+        used: set[str] = set()
+        expression = self.generate_expression(node, ext, used)
+        lines = ["def rule(state, progress, player, ext):"]
+        if "counts" in used:
+            lines.append("    counts = progress.counts")
+        if "mask" in used:
+            lines.append("    mask = progress.mask")
+        if "prog_items" in used:
+            lines.append("    prog_items = state.prog_items[player]")
+        lines.append(f"    return {expression}")
+        source = "\n".join(lines)
+
+        function = self.functions.get(source)
+        if function is None:
+            code = self.code.get(source)
+            if code is None:
+                code = self.code[source] = compile(source, "<manual generated rule>", "exec")
+                new_generated_code.add(self.cache_file)
+            used_generated_sources.setdefault(self.cache_file, set()).add(source)
+            namespace = {}
+            exec(code, namespace)
+            function = self.functions[source] = namespace["rule"]
+
+        return GeneratedNode(node, function, self.compiler.player, tuple(ext))
+
+    def generate_expression(self, node: RequiresNode, ext: list[Callable], used: set[str]) -> str:
+        node_type = type(node)
+        if node_type is ConstantNode:
+            return repr(node.value)
+        elif node_type is ItemNode:
+            used.add("counts")
+            return f"counts[{node.ordinal}] >= {node.threshold}"
+        elif node_type is AnyItemNode:
+            used.add("mask")
+            return f"(mask & {node.bits}) != 0"
+        elif node_type is AllItemsNode:
+            used.add("mask")
+            return f"(mask & {node.bits}) == {node.bits}"
+        elif node_type in (CategoryNode, ValueNode):
+            used.add("prog_items")
+            return f"prog_items[{node.state_key!r}] >= {node.threshold}"
+        elif node_type is NotNode:
+            return f"not ({self.generate_expression(node.child, ext, used)})"
+        elif node_type in (AndNode, OrNode):
+            operator = " and " if node_type is AndNode else " or "
+            return "(" + operator.join(self.generate_expression(child, ext, used) for child in node.children) + ")"
+
+        # Anything else keeps its own evaluate, eg. functions and the relative counts that can change after set_rules
+        ext.append(node.evaluate)
+        return f"ext[{len(ext) - 1}](state, progress)"
+
+class RuleProfiler:
+    """Call counts, cumulative time and results of the rules of one player, by kind (location, region, entrance, function) and name.\n
+    A rule's time includes the time of the requires functions it called."""
+
+    def __init__(self):
+        # [calls, total time, calls that returned True]
+        self.entries: dict[tuple[str, str], list] = {}
+
+    def wrap(self, kind: str, name: str, rule: Callable) -> Callable:
+        entry = self.entries.setdefault((kind, name), [0, 0.0, 0])
+
+        def profiled_rule(*args):
+            start = perf_counter()
+            result = rule(*args)
+            entry[1] += perf_counter() - start
+            entry[0] += 1
+            if result is True:
+                entry[2] += 1
+            return result
+
+        return profiled_rule
+
+    def get_report(self) -> list[dict]:
+        """The entries sorted by total time, the most costly first"""
+        report = []
+        for (kind, name), (calls, total_time, true_results) in self.entries.items():
+            report.append({
+                "kind": kind,
+                "name": name,
+                "calls": calls,
+                "total_time": total_time,
+                "average_time": total_time / calls if calls else 0.0,
+                "true_ratio": true_results / calls if calls else 0.0,
+            })
+        report.sort(key=lambda entry: entry["total_time"], reverse=True)
+        return report
+
+    def write_report(self, output_directory: str, filename: str):
+        """Write the report as filename.json and filename.csv in output_directory"""
+        report = self.get_report()
+        with open(os.path.join(output_directory, f"{filename}.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        with open(os.path.join(output_directory, f"{filename}.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["kind", "name", "calls", "total_time", "average_time", "true_ratio"])
+            writer.writeheader()
+            writer.writerows(report)
+
+# These functions only depend on the player's options, so they're called once while compiling and replaced by their result
+option_requires_functions = ("YamlEnabled", "YamlDisabled", "YamlCompare")
+# These functions only depend on the item pool, so they're expanded once by a PoolMacroNode
+pool_requires_functions = ("OptOne", "OptAll")
+
+class RequiresCompiler:
+    """Compile the requires strings of one player into RequiresNode trees.\n
+    This is done once in set_rules so the text doesn't get parsed again on every access check."""
+
+    def __init__(self, world: "ManualWorld", multiworld: MultiWorld, player: int):
+        self.world = world
+        self.multiworld = multiworld
+        self.player = player
+        self.empty_progress = ManualProgress.empty(len(world.item_name_to_ordinal))
+        self.relative_nodes: list[ItemNode | CategoryNode | PoolMacroNode] = []
+        self.items_counts: Optional[Counter[str]] = None
+        self.items_counts_version: Optional[int] = None
+        # Changes whenever the relative thresholds are resolved again, which invalidates every memorized result
+        self.epoch = object()
+        # The memoized CompiledRules that depend on each item, indexed by item ordinal
+        self.dependents: list[list[CompiledRule]] = [[] for _ in world.item_name_to_ordinal]
+        self.generator = RequiresCodeGenerator(self) if world.rules_code_generation else None
+        self.profiler = RuleProfiler() if world.rules_profiling else None
+        # Every distinct compiled rule by the key of its node, so identical requires share one rule and one memo slot
+        self.rules: dict[tuple, CompiledRule] = {}
+        self.attached_rules = 0
+        # The compiled requires of each region, entrance and location by name
+        self.region_nodes: dict[str, list[RequiresNode]] = {}
+        self.entrance_nodes: dict[str, list[RequiresNode]] = {}
+        self.location_nodes: dict[str, list[RequiresNode]] = {}
+        # Item and @category names to the (kind, name) of the areas whose requires mention them, built on first use
+        self.mentions_index: Optional[dict[str, list[tuple[str, str]]]] = None
+
+    def compile(self, requires: str, area: dict, depth: int = 0) -> RequiresNode:
+        if requires == "":
+            return ConstantNode(True)
+
+        try:
+            syntax = parse_requires_string(requires)
+        except RequiresParseError as ex:
+            raise construct_logic_error(area, ex.source)
+
+        if depth > self.world.rules_functions_maximum_recursion:
+            found_functions = self.find_functions(syntax)
+            if found_functions:
+                area_type, area_name = get_area_description(area)
+                raise RecursionError(f'One or more functions in {area_type} "{area_name}"\'s requires looped too many time (maximum recursion is {self.world.rules_functions_maximum_recursion}) \
+                                     \n    As of this Exception the following function(s) are waiting to run: {found_functions} \
+                                     \n    And the currently processed requires look like this: "{requires}"')
+
+        return self.build(syntax, area, depth)
+
+    def find_functions(self, syntax: tuple) -> list[str]:
+        if syntax[0] == "function":
+            return [syntax[1]]
+        elif syntax[0] in ("and", "or"):
+            return [func_name for child in syntax[1] for func_name in self.find_functions(child)]
+        elif syntax[0] == "not":
+            return self.find_functions(syntax[1])
+        return []
+
+    def build(self, syntax: tuple, area: dict, depth: int) -> RequiresNode:
+        kind = syntax[0]
+
+        if kind == "constant":
+            return ConstantNode(syntax[1])
+        elif kind == "not":
+            child = self.build(syntax[1], area, depth)
+            if isinstance(child, ConstantNode):
+                return ConstantNode(not child.value)
+            return NotNode(child)
+        elif kind in ("and", "or"):
+            return self.build_operator(kind, [self.build(child, area, depth) for child in syntax[1]])
+        elif kind == "item":
+            return self.build_item(syntax[1], self.convert_count(syntax[1], syntax[2], area))
+        elif kind == "category":
+            count = self.convert_count(syntax[1], syntax[2], area)
+            item_names = self.get_category_items(syntax[1])
+            if not item_names: # An empty category never counts as collected, even when asking for 0 of it
+                return ConstantNode(False)
+            if isinstance(count, int):
+                return CategoryNode(self, syntax[1], item_names, count)
+            return self.add_relative_node(RelativeCategoryNode(self, syntax[1], item_names, count))
+        elif kind == "function":
+            return self.build_function(syntax[1], syntax[2], area, depth)
+
+        raise ValueError(f"Unknown requires expression {syntax}")
+
+    def build_item(self, item_name: str, count: int | str | float) -> RequiresNode:
+        ordinal = self.world.item_name_to_ordinal.get(item_name)
+        if ordinal is None:
+            node = StateItemNode(self, item_name, ordinal, count)
+            return node if isinstance(count, int) else self.add_relative_node(node)
+        if isinstance(count, int):
+            return ItemNode(self, item_name, ordinal, count) if count > 0 else ConstantNode(True)
+        return self.add_relative_node(RelativeItemNode(self, item_name, ordinal, count))
+
+    def compile_list(self, requires: list | dict, area: dict) -> RequiresNode:
+        """Compile the dict/list form of requires, eg. ["ItemA", "ItemB:2", {"or": ["ItemC", "ItemD"]}, ["ItemE", "ItemF"]].\n
+        It keeps the semantics it always had: the area is accessible when every plain entry is collected,
+        or when every item of any one of the {"or": [...]}/[...] groups is, whatever the plain entries are."""
+        groups = []
+        plain_entries = []
+        for entry in requires:
+            if (isinstance(entry, dict) and isinstance(entry.get("or"), list)) or isinstance(entry, list):
+                group_entries = entry["or"] if isinstance(entry, dict) else entry
+                groups.append(self.build_operator("and", [self.build_list_entry(group_entry, area) for group_entry in group_entries]))
+            else:
+                plain_entries.append(self.build_list_entry(entry, area))
+
+        return self.build_operator("or", groups + [self.build_operator("and", plain_entries)])
+
+    def build_list_entry(self, entry: str, area: dict) -> RequiresNode:
+        """An "Item" or "Item:count" entry of the dict/list form of requires"""
+        if not isinstance(entry, str):
+            area_type, area_name = get_area_description(area)
+            raise ValueError(f'Invalid requires entry {entry!r} in {area_type} "{area_name}".')
+
+        entry_parts = entry.split(":")
+        if len(entry_parts) == 1:
+            return self.build_item(entry, 1)
+
+        try:
+            count = int(entry_parts[1])
+        except ValueError as e:
+            raise ValueError(f"Invalid item count `{entry}` in {area}.") from e
+        return self.build_item(entry_parts[0], count)
+
+    def build_function(self, func_name: str, func_args: str, area: dict, depth: int) -> RequiresNode:
+        func = globals().get(func_name)
+
+        if func is None:
+            func = getattr(Rules, func_name, None)
+
+        if not callable(func):
+            area_type, area_name = get_area_description(area)
+            raise ValueError(f'Invalid function "{func_name}" in {area_type} "{area_name}".')
+
+        if func_name == "ItemValue" and func is globals().get(func_name) and "," not in func_args:
+            return self.build_item_value(func_args.strip())
+
+        node = FunctionNode(self, func, func_name, func_args, area, depth)
+        if func_name in option_requires_functions and func is globals().get(func_name):
+            return ConstantNode(node.evaluate(None, None))
+        if func_name in pool_requires_functions and func is globals().get(func_name):
+            return self.add_relative_node(PoolMacroNode(node))
+
+        # Only the functions still called during fill get profiled, the ones above are only called while compiling
+        if self.profiler is not None:
+            node.call = self.profiler.wrap("function", func_name, node.call)
+        return node
+
+    def build_item_value(self, value_count: str) -> RequiresNode:
+        """{ItemValue(value:count)} only needs the value's state key and the count, so it's resolved now instead of being called"""
+        args = value_count.split(":")
+        if not len(args) == 2 or not args[1].isnumeric():
+            raise Exception(f"ItemValue needs a number after : so it looks something like 'ItemValue({args[0]}:12)'")
+        return ValueNode(self, args[0], int(args[1].strip()))
+
+    def build_operator(self, operator: str, children: list[RequiresNode]) -> RequiresNode:
+        """Build an AND/OR node, dropping the constants (e.g. folded YamlEnabled) and the branches they make unreachable"""
+        node_type = AndNode if operator == "and" else OrNode
+        deciding_value = operator == "or" # True decides an OR, False decides an AND
+
+        operands = []
+        for child in children:
+            if isinstance(child, ConstantNode):
+                if child.value == deciding_value:
+                    return child
+                continue
+            if isinstance(child, node_type):
+                operands.extend(child.children)
+            else:
+                operands.append(child)
+
+        # Items that only need to be collected once can all be tested with a single bitmask check
+        single_items = [operand for operand in operands if type(operand) is ItemNode and operand.threshold == 1]
+        if len(single_items) > 1:
+            bits = sum(1 << ordinal for ordinal in {operand.ordinal for operand in single_items})
+            operands = [AnyItemNode(bits) if operator == "or" else AllItemsNode(bits)] + [operand for operand in operands if operand not in single_items]
+
+        if not operands:
+            return ConstantNode(not deciding_value)
+        if len(operands) == 1:
+            return operands[0]
+        return node_type(tuple(operands))
+
+    def make_rule(self, node: RequiresNode) -> Callable[[CollectionState], bool]:
+        """Wrap a node into an access rule, which gets memoized when its result only depends on items of items.json.\n
+        Identical requires, wherever they come from, get the same rule."""
+        self.attached_rules += 1
+        key = node.key()
+        rule = self.rules.get(key)
+        if rule is not None:
+            return rule
+
+        if self.generator is not None:
+            node = self.generator.generate(node)
+        rule = self.rules[key] = CompiledRule(node, self.player, self)
+        ordinals = set()
+        if node.find_dependencies(ordinals):
+            rule.memoize = True
+            for ordinal in ordinals:
+                self.dependents[ordinal].append(rule)
+        return rule
+
+    def find_mentions(self, node: RequiresNode, mentions: set[str]):
+        """Add the names of the items and the @categories checked by node to mentions, the items of a category count as mentioned too.\n
+        What a function looks at can't be known, so it's left out."""
+        if isinstance(node, ItemNode):
+            mentions.add(node.item_name)
+        elif isinstance(node, (AnyItemNode, AllItemsNode)):
+            ordinals = set()
+            node.find_dependencies(ordinals)
+            mentions.update(self.world.item_table[ordinal]["name"] for ordinal in ordinals)
+        elif isinstance(node, CategoryNode):
+            mentions.add(f"@{node.category_name}")
+            mentions.update(node.item_names)
+        elif isinstance(node, ValueNode):
+            mentions.update(self.world.item_table[ordinal]["name"] for ordinal, _ in node.deltas)
+        elif isinstance(node, (AndNode, OrNode)):
+            for child in node.children:
+                self.find_mentions(child, mentions)
+        elif isinstance(node, (NotNode, PoolMacroNode)):
+            self.find_mentions(node.child, mentions)
+        elif isinstance(node, GeneratedNode):
+            self.find_mentions(node.node, mentions)
+
+    def get_rules_depending_on(self, name: str) -> list[tuple[str, str]]:
+        """The (kind, name) of the regions, entrances and locations whose requires mention the item, or the category when name starts with @"""
+        if self.mentions_index is None:
+            self.mentions_index = {}
+            for kind, area_nodes in (("region", self.region_nodes), ("entrance", self.entrance_nodes), ("location", self.location_nodes)):
+                for area_name, nodes in area_nodes.items():
+                    mentions = set()
+                    for node in nodes:
+                        self.find_mentions(node, mentions)
+                    for mention in mentions:
+                        self.mentions_index.setdefault(mention, []).append((kind, area_name))
+        return self.mentions_index.get(name, [])
+
+    def find_reach_targets(self, node: RequiresNode, targets: set[str]):
+        """Add the locations checked with {canReachLocation(...)} in node to targets"""
+        if isinstance(node, FunctionNode):
+            if node.func is canReachLocation:
+                targets.add(node.func_args.strip())
+        elif isinstance(node, (AndNode, OrNode)):
+            for child in node.children:
+                self.find_reach_targets(child, targets)
+        elif isinstance(node, (NotNode, PoolMacroNode)):
+            self.find_reach_targets(node.child, targets)
+        elif isinstance(node, GeneratedNode):
+            self.find_reach_targets(node.node, targets)
+
+    def detect_reach_cycles(self) -> list[list[str]]:
+        """Find the locations whose requires end up needing themselves through {canReachLocation(...)},
+        either directly or through the requires of their region, the entrances to it and the regions those come from.
+        Going around regions alone is just how regions connect, so only the cycles with a canReachLocation in them count.
+        Each cycle found gets logged as a warning."""
+        def find_targets(nodes: list[RequiresNode]) -> set[str]:
+            targets = set()
+            for node in nodes:
+                self.find_reach_targets(node, targets)
+            return targets
+
+        region_targets = {region: find_targets(nodes) for region, nodes in self.region_nodes.items()}
+        for entrance_name, nodes in self.entrance_nodes.items():
+            region = self.world.get_entrance(entrance_name).connected_region
+            if region is not None:
+                region_targets.setdefault(region.name, set()).update(find_targets(nodes))
+        location_targets = {location: find_targets(nodes) for location, nodes in self.location_nodes.items()}
+
+        # What reaching an area needs, as (area, is it through a canReachLocation) edges
+        edges: dict[tuple[str, str], list[tuple[tuple[str, str], bool]]] = {}
+
+        def get_edges(area: tuple[str, str]) -> list[tuple[tuple[str, str], bool]]:
+            area_edges = edges.get(area)
+            if area_edges is not None:
+                return area_edges
+            kind, name = area
+            if kind == "region":
+                area_edges = [(("location", target), True) for target in region_targets.get(name, ())]
+                try:
+                    region = self.multiworld.get_region(name, self.player)
+                except KeyError:
+                    region = None
+                if region is not None:
+                    area_edges.extend((("region", entrance.parent_region.name), False)
+                                      for entrance in region.entrances if entrance.parent_region is not None)
             else:
-                item_parts = item.split(":")
-                item_name = item
-                item_count = 1
+                area_edges = [(("location", target), True) for target in location_targets.get(name, ())]
+                try:
+                    location = self.multiworld.get_location(name, self.player)
+                except KeyError: # Not a location of this world, calling canReachLocation on it will raise by itself
+                    location = None
+                if location is not None and location.parent_region is not None:
+                    area_edges.append((("region", location.parent_region.name), False))
+            edges[area] = area_edges
+            return area_edges
+
+        # Group the areas into strongly connected components (Tarjan's algorithm, without recursion)
+        index: dict[tuple[str, str], int] = {}
+        lowlink: dict[tuple[str, str], int] = {}
+        component: dict[tuple[str, str], tuple[str, str]] = {}
+        component_stack = []
+        for start in [("location", location) for location in location_targets] + [("region", region) for region in region_targets]:
+            if start in index:
+                continue
+            index[start] = lowlink[start] = len(index)
+            component_stack.append(start)
+            work = [(start, iter(get_edges(start)))]
+            while work:
+                area, area_edges = work[-1]
+                edge = next(area_edges, None)
+                if edge is not None:
+                    target = edge[0]
+                    if target not in index:
+                        index[target] = lowlink[target] = len(index)
+                        component_stack.append(target)
+                        work.append((target, iter(get_edges(target))))
+                    elif target not in component:
+                        lowlink[area] = min(lowlink[area], index[target])
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[area])
+                if lowlink[area] == index[area]:
+                    while True:
+                        member = component_stack.pop()
+                        component[member] = area
+                        if member == area:
+                            break
+
+        def find_path(source: tuple[str, str], destination: tuple[str, str]) -> list[tuple[str, str]]:
+            """The shortest path from source to destination, staying in their component"""
+            previous = {source: None}
+            queue = deque([source])
+            while queue:
+                area = queue.popleft()
+                if area == destination:
+                    break
+                for target, _ in get_edges(area):
+                    if target not in previous and component.get(target) == component[source]:
+                        previous[target] = area
+                        queue.append(target)
+            path = [destination]
+            while path[-1] != source:
+                path.append(previous[path[-1]])
+            return path[::-1]
+
+        # A canReachLocation edge inside a component closes a cycle with the path back from its target
+        cycles = []
+        found = set()
+        for area, area_edges in edges.items():
+            for target, through_reach in area_edges:
+                if through_reach and target in component and component[target] == component[area]:
+                    cycle = [area] + find_path(target, area)
+                    # The same cycle is closed by each of its canReachLocation edges, only keep it once whatever area it starts from
+                    first = cycle.index(min(cycle[:-1]))
+                    rotated = tuple(cycle[first:-1] + cycle[:first])
+                    if rotated not in found:
+                        found.add(rotated)
+                        cycles.append([name for _, name in cycle])
+
+        for cycle in cycles:
+            logging.warning(f"{self.world.game} player {self.player}: {{canReachLocation(...)}} calls loop back on themselves: {' -> '.join(cycle)}")
+        return cycles
+
+    def get_rule_stats(self) -> RuleStats:
+        return RuleStats(self.attached_rules, len(self.rules))
+
+    def convert_count(self, item_name: str, item_count: str, area: dict) -> int | str | float:
+        """Convert the count of an item to an int, or to 'all'/'half'/a fraction when it depends on the item pool"""
+        if item_count.lower() in ('all', 'half'):
+            return item_count.lower()
 
-                if len(item_parts) > 1:
-                    item_name = item_parts[0]
-                    item_count = int(item_parts[1])
+        try:
+            if item_count.endswith('%') and len(item_count) > 1:
+                return clamp(float(item_count[:-1]) / 100, 0, 1)
+            return int(item_count)
+        except ValueError as e:
+            raise ValueError(f"Invalid item count `{item_name}` in {area}.") from e
+
+    def get_category_items(self, category_name: str) -> tuple[str, ...]:
+        return self.world.category_name_to_item_names.get(category_name, ())
+
+    def add_relative_node(self, node: ItemNode | CategoryNode | PoolMacroNode) -> ItemNode | CategoryNode | PoolMacroNode:
+        self.relative_nodes.append(node)
+        if self.items_counts is not None:
+            node.resolve_threshold(self.items_counts)
+        return node
+
+    def resolve_item_counts(self):
+        """Turn every 'all', 'half' and percentage count into a fixed threshold, using the progression item counts of create_items.\n
+        It runs again by itself if world.item_counts_progression gets replaced or modified afterward, eg. by a hook."""
+        self.items_counts = self.world.get_item_counts(self.player, only_progression=True)
+        self.items_counts_version = getattr(self.items_counts, "version", None)
+        for node in self.relative_nodes:
+            node.resolve_threshold(self.items_counts)
+        self.epoch = object()
+
+    def refresh_item_counts(self):
+        items_counts = self.world.get_item_counts(self.player, only_progression=True)
+        if items_counts is not self.items_counts or getattr(items_counts, "version", None) != self.items_counts_version:
+            self.resolve_item_counts()
 
-                if not state.has(item_name, player, item_count):
-                    canAccess = False
+def set_rules(world: "ManualWorld", multiworld: MultiWorld, player: int):
+    compiler = world.requires_compiler = RequiresCompiler(world, multiworld, player)
 
-        return canAccess
+    def allRegionsAccessible(state: CollectionState):
+        return True
 
-    # handle any type of checking needed, then ferry the check off to a dedicated method for that check
-    def fullLocationOrRegionCheck(state: CollectionState, area: dict):
+    # compile the requires of the area once, then every check goes straight to the compiled rule
+    # the compiled node is also added to nodes so evaluate_rules_batch can find it
+    def compileLocationOrRegionRule(area: dict, nodes: list[RequiresNode]) -> Callable[[CollectionState], bool]:
         # if it's not a usable object of some sort, default to true
         if not area:
-            return True
+            return allRegionsAccessible
 
         # don't require the "requires" key for locations and regions if they don't need to use it
         if "requires" not in area.keys():
-            return True
+            return allRegionsAccessible
 
         if isinstance(area["requires"], str):
-            return checkRequireStringForArea(state, area)
+            node = compiler.compile(area["requires"], area)
         else:  # item access is in dict form
-            return checkRequireDictForArea(state, area)
+            node = compiler.compile_list(area["requires"], area)
 
-    used_location_names = []
+        nodes.append(node)
+        if isinstance(node, ConstantNode) and node.value:
+            return allRegionsAccessible
+        return compiler.make_rule(node)
+
+    # when world.rules_profiling is enabled, record the calls, time and results of the rule for that area
+    def profileRule(kind: str, name: str, rule: Callable[[CollectionState], bool]) -> Callable[[CollectionState], bool]:
+        if compiler.profiler is None or rule is allRegionsAccessible:
+            return rule
+        return compiler.profiler.wrap(kind, name, rule)
+
+    used_location_names = set()
+    region_rules: dict[str, Callable[[CollectionState], bool]] = {}
     # Region access rules
     for region in regionMap.keys():
-        used_location_names.extend([l.name for l in multiworld.get_region(region, player).locations])
+        used_location_names.update(l.name for l in multiworld.get_region(region, player).locations)
         if region != "Menu":
-            for exitRegion in multiworld.get_region(region, player).entrances:
-                def fullRegionCheck(state: CollectionState, region=regionMap[region], region_name=exitRegion.name):
-                    region['name'] = region_name
-                    region['is_region'] = True
-
-                    return fullLocationOrRegionCheck(state, region)
-
-                add_rule(world.get_entrance(exitRegion.name), fullRegionCheck)
+            region_rules[region] = compileLocationOrRegionRule({**regionMap[region], "name": region, "is_region": True},
+                                                                 compiler.region_nodes.setdefault(region, []))
+            if region_rules[region] is not allRegionsAccessible:
+                regionRule = profileRule("region", region, region_rules[region])
+                for exitRegion in multiworld.get_region(region, player).entrances:
+                    add_rule(world.get_entrance(exitRegion.name), regionRule)
             entrance_rules = regionMap[region].get("entrance_requires", {})
             for e in entrance_rules:
                 entrance = world.get_entrance(f'{e}To{region}')
-                add_rule(entrance, lambda state, rule={"requires": entrance_rules[e]}: fullLocationOrRegionCheck(state, rule))
+                add_rule(entrance, profileRule("entrance", entrance.name, compileLocationOrRegionRule({"name": entrance.name, "requires": entrance_rules[e]},
+                                                                                                      compiler.entrance_nodes.setdefault(entrance.name, []))))
             exit_rules = regionMap[region].get("exit_requires", {})
             for e in exit_rules:
                 exit = world.get_entrance(f'{region}To{e}')
-                add_rule(exit, lambda state, rule={"requires": exit_rules[e]}: fullLocationOrRegionCheck(state, rule))
+                add_rule(exit, profileRule("entrance", exit.name, compileLocationOrRegionRule({"name": exit.name, "requires": exit_rules[e]},
+                                                                                              compiler.entrance_nodes.setdefault(exit.name, []))))
 
     # Location access rules
     for location in world.location_table:
@@ -310,82 +1312,180 @@ def set_rules(world: "ManualWorld", multiworld: MultiWorld, player: int):
 
         locFromWorld = multiworld.get_location(location["name"], player)
 
-        locationRegion = regionMap[location["region"]] if "region" in location else None
+        regionRule = region_rules[location["region"]] if "region" in location else None
 
-        if locationRegion:
-            locationRegion['name'] = location['region']
-            locationRegion['is_region'] = True
+        # The region's requires are already checked by its entrances, which Archipelago goes through before reading the location's rule
+        if world.location_rules_rely_on_region:
+            regionRule = None
 
         if "requires" in location: # Location has requires, check them alongside the region requires
-            def checkBothLocationAndRegion(state: CollectionState, location=location, region=locationRegion):
-                locationCheck = fullLocationOrRegionCheck(state, location)
-                regionCheck = True # default to true unless there's a region with requires
+            locationRule = compileLocationOrRegionRule(location, compiler.location_nodes.setdefault(location["name"], []))
 
-                if region:
-                    regionCheck = fullLocationOrRegionCheck(state, region)
+            if regionRule is None or regionRule is allRegionsAccessible: # default to true unless there's a region with requires
+                set_rule(locFromWorld, profileRule("location", location["name"], locationRule))
+            else:
+                def checkBothLocationAndRegion(state: CollectionState, locationRule=locationRule, regionRule=regionRule):
+                    return locationRule(state) and regionRule(state)
 
-                return locationCheck and regionCheck
+                set_rule(locFromWorld, profileRule("location", location["name"], checkBothLocationAndRegion))
+        elif regionRule is not None: # Only region access required, check the location's region's requires
+            set_rule(locFromWorld, profileRule("location", location["name"], regionRule))
+        else: # No location region and no location requires? It's accessible.
+            set_rule(locFromWorld, allRegionsAccessible)
 
-            set_rule(locFromWorld, checkBothLocationAndRegion)
-        elif "region" in location: # Only region access required, check the location's region's requires
-            def fullRegionCheck(state, region=locationRegion):
-                return fullLocationOrRegionCheck(state, region)
+    # The item pool is final by now, so the relative item counts can be fixed once
+    compiler.resolve_item_counts()
 
-            set_rule(locFromWorld, fullRegionCheck)
-        else: # No location region and no location requires? It's accessible.
-            def allRegionsAccessible(state):
-                return True
+    compiler.detect_reach_cycles()
 
-            set_rule(locFromWorld, allRegionsAccessible)
+    rule_stats = compiler.get_rule_stats()
+    logging.debug(f"{world.game} player {player}: {rule_stats.attached} requires compiled into {rule_stats.unique} distinct rules")
 
     # Victory requirement
     multiworld.completion_condition[player] = lambda state: state.has("__Victory__", player)
 
-    def convert_req_function_args(state: CollectionState, func, args: list[str], areaName: str):
-        parameters = inspect.signature(func).parameters
-        knownParameters = [World, 'ManualWorld', MultiWorld, CollectionState]
-        index = -1
-        for parameter in parameters.values():
-            target_type = parameter.annotation
-            index += 1
-            if target_type in knownParameters:
-                if target_type in [World, 'ManualWorld']:
-                    args.insert(index, world)
-                elif target_type == MultiWorld:
-                    args.insert(index, multiworld)
-                elif target_type == CollectionState:
-                    args.insert(index, state)
-                continue
-            if parameter.name.lower() == "player":
-                args.insert(index, player)
+class BatchReachability(NamedTuple):
+    """Result of evaluate_rules_batch, one row per state and one column per region/location name"""
+    region_names: list[str]
+    regions: "numpy.ndarray"
+    location_names: list[str]
+    locations: "numpy.ndarray"
+
+def evaluate_rules_batch(world: "ManualWorld", item_counts) -> BatchReachability:
+    """Evaluate the reachability of every region and location of the world for many states at once, using NumPy.\n
+    item_counts is a states x items matrix of collected item counts, its columns follow world.item_name_to_ordinal (the order of items.json).
+    It must be called after set_rules. Only the requires of the data files are known here, so rules added by hooks aren't checked
+    and requires using functions or items outside of items.json raise a ValueError."""
+    import numpy
+
+    compiler = world.requires_compiler
+    if compiler is None:
+        raise ValueError("evaluate_rules_batch can only be used after set_rules.")
+
+    counts = numpy.asarray(item_counts)
+    if counts.ndim != 2 or counts.shape[1] != len(world.item_name_to_ordinal):
+        raise ValueError(f"item_counts should be a states x {len(world.item_name_to_ordinal)} items matrix, got the shape {counts.shape}.")
+    compiler.refresh_item_counts()
+
+    def evaluate_nodes(nodes: list[RequiresNode], area_type: str, area_name: str) -> "numpy.ndarray":
+        result = numpy.ones(counts.shape[0], dtype=bool)
+        for node in nodes:
+            try:
+                result &= node.evaluate_batch(counts)
+            except BatchUnsupportedError as ex:
+                raise ValueError(f'The requires of {area_type} "{area_name}" can\'t be evaluated in a batch: {ex}') from ex
+        return result
+
+    regions = list(world.multiworld.get_regions(world.player))
+    region_names = [region.name for region in regions]
+    reachable = {region.name: numpy.zeros(counts.shape[0], dtype=bool) for region in regions}
+    reachable["Menu"][:] = True
+
+    # The region's requires are on all of its entrances, so they're evaluated once and combined with each entrance's own
+    entrances = []
+    for region in regions:
+        region_access = evaluate_nodes(compiler.region_nodes.get(region.name, []), "region", region.name)
+        for entrance in region.entrances:
+            if entrance.parent_region is None or entrance.parent_region.name not in reachable:
                 continue
+            access = region_access & evaluate_nodes(compiler.entrance_nodes.get(entrance.name, []), "entrance", entrance.name)
+            entrances.append((entrance.parent_region.name, region.name, access))
+
+    # Open new regions until nothing changes, every pass only has to go through the entrances again
+    changed = True
+    while changed:
+        changed = False
+        for parent_name, region_name, access in entrances:
+            newly_reachable = reachable[parent_name] & access & ~reachable[region_name]
+            if newly_reachable.any():
+                reachable[region_name] |= newly_reachable
+                changed = True
+
+    locations = [location for region in regions for location in region.locations]
+    location_names = [location.name for location in locations]
+    location_columns = [reachable[location.parent_region.name] & evaluate_nodes(compiler.location_nodes.get(location.name, []), "location", location.name)
+                        for location in locations]
+
+    return BatchReachability(
+        region_names,
+        numpy.stack([reachable[name] for name in region_names], axis=1) if regions else numpy.zeros((counts.shape[0], 0), dtype=bool),
+        location_names,
+        numpy.stack(location_columns, axis=1) if locations else numpy.zeros((counts.shape[0], 0), dtype=bool),
+    )
+
+# Stands in for the CollectionState while the arguments of a requires function get bound
+state_argument_placeholder = object()
+
+def bind_req_function(world: "ManualWorld", func, func_args: str, areaName: str) -> Callable[[CollectionState], object]:
+    """Convert the arguments of a {Function(args)} call site once, and return a callable that only needs the CollectionState"""
+    args = func_args.split(",")
+    if args == ['']:
+        args.pop()
+
+    convert_req_function_args(world, state_argument_placeholder, func, args, areaName)
+    state_positions = [index for index, arg in enumerate(args) if arg is state_argument_placeholder]
+
+    if not state_positions:
+        return lambda state: func(*args)
+    elif len(state_positions) == 1:
+        before = tuple(args[:state_positions[0]])
+        after = tuple(args[state_positions[0] + 1:])
+        return lambda state: func(*before, state, *after)
+
+    def call(state: CollectionState):
+        call_args = list(args)
+        for index in state_positions:
+            call_args[index] = state
+        return func(*call_args)
+    return call
+
+def convert_req_function_args(world: "ManualWorld", state: CollectionState, func, args: list[str], areaName: str):
+    multiworld = world.multiworld
+    player = world.player
+    parameters = inspect.signature(func).parameters
+    knownParameters = [World, 'ManualWorld', MultiWorld, CollectionState]
+    index = -1
+    for parameter in parameters.values():
+        target_type = parameter.annotation
+        index += 1
+        if target_type in knownParameters:
+            if target_type in [World, 'ManualWorld']:
+                args.insert(index, world)
+            elif target_type == MultiWorld:
+                args.insert(index, multiworld)
+            elif target_type == CollectionState:
+                args.insert(index, state)
+            continue
+        if parameter.name.lower() == "player":
+            args.insert(index, player)
+            continue
 
-            if index < len(args) and args[index] != "":
-                value = args[index].strip()
+        if index < len(args) and args[index] != "":
+            value = args[index].strip()
+        else:
+            if parameter.default is not inspect.Parameter.empty:
+                if index < len(args):
+                    args[index] = parameter.default
+                else:
+                    args.insert(index, parameter.default)
+                continue
             else:
-                if parameter.default is not inspect.Parameter.empty:
-                    if index < len(args):
-                        args[index] = parameter.default
-                    else:
-                        args.insert(index, parameter.default)
-                    continue
+                if parameter.annotation is inspect.Parameter.empty:
+                    raise Exception(f"A call of the \"{func.__name__}\" function in \"{areaName}\"'s requirement, asks for a value for its argument \"{parameter.name}\" but it's missing.")
                 else:
-                    if parameter.annotation is inspect.Parameter.empty:
-                        raise Exception(f"A call of the \"{func.__name__}\" function in \"{areaName}\"'s requirement, asks for a value for its argument \"{parameter.name}\" but it's missing.")
-                    else:
-                        raise Exception(f"A call of the \"{func.__name__}\" function in \"{areaName}\"'s requirement, asks for a value of type {target_type} for its argument \"{parameter.name}\" but it's missing.")
+                    raise Exception(f"A call of the \"{func.__name__}\" function in \"{areaName}\"'s requirement, asks for a value of type {target_type} for its argument \"{parameter.name}\" but it's missing.")
 
-            if target_type == str or parameter.annotation is inspect.Parameter.empty: #Don't convert since its already a string or if we don't know the type to convert to
-                args[index] = value
-                continue
+        if target_type == str or parameter.annotation is inspect.Parameter.empty: #Don't convert since its already a string or if we don't know the type to convert to
+            args[index] = value
+            continue
 
-            try:
-                value = convert_string_to_type(value, target_type)
+        try:
+            value = convert_string_to_type(value, target_type)
 
-            except Exception as e:
-                raise Exception(f"A call of the \"{func.__name__}\" function in \"{areaName}\"'s requirement, asks for a value of type {target_type}\nfor its argument \"{parameter.name}\" but its value \"{value}\" cannot be converted to {target_type} \nOriginal Error:'{e}'")
+        except Exception as e:
+            raise Exception(f"A call of the \"{func.__name__}\" function in \"{areaName}\"'s requirement, asks for a value of type {target_type}\nfor its argument \"{parameter.name}\" but its value \"{value}\" cannot be converted to {target_type} \nOriginal Error:'{e}'")
 
-            args[index] = value
+        args[index] = value
 
 
 def ItemValue(state: CollectionState, player: int, valueCount: str):
@@ -430,9 +1530,8 @@ def OptOne(world: "ManualWorld", item: str, items_counts: Optional[dict] = None)
 
     if require_type == 'category':
         if item_count.isnumeric():
-            #Only loop if we can use the result to clamp
-            category_items = [item for item in world.item_name_to_item.values() if "category" in item and item_name in item["category"]]
-            category_items_counts = sum([items_counts.get(category_item["name"], 0) for category_item in category_items])
+            #Only count if we can use the result to clamp
+            category_items_counts = sum([items_counts.get(category_item, 0) for category_item in world.category_name_to_item_names.get(item_name, ())])
             item_count = clamp(int(item_count), 0, category_items_counts)
         return f"|@{item_name}:{item_count}|"
     elif require_type == 'item':
@@ -470,8 +1569,14 @@ def OptAll(world: "ManualWorld", requires: str):
 
 # Rule to expose the can_reach_location core function
 def canReachLocation(state: CollectionState, player: int, location: str):
-    """Can the player reach the given location?"""
+    """Can the player reach the given location?\n
+    A location found reachable stays so until the player's items change, so it's remembered for the state until then.
+    An unreachable one is always checked again, it can become reachable while the state is still updating its reachable regions."""
+    reachable_locations = state.manual_reachable_locations.get(player)
+    if reachable_locations is not None and location in reachable_locations:
+        return True
     if state.can_reach_location(location, player):
+        state.manual_reachable_locations.setdefault(player, set()).add(location)
         return True
     return False
 
@@ -483,71 +1588,53 @@ def YamlDisabled(multiworld: MultiWorld, player: int, param: str) -> bool:
     """Is a yaml option disabled?"""
     return not is_option_enabled(multiworld, player, param)
 
-def YamlCompare(world: "ManualWorld", multiworld: MultiWorld, state: CollectionState, player: int, args: str, skipCache: bool = False) -> bool:
-    """Is a yaml option's value compared using {comparator} to the requested value
-    \nFormat it like {YamlCompare(OptionName==value)}
-    \nWhere == can be any of the following: ==, !=, >=, <=, <, >
-    \nExample: {YamlCompare(Example_Range > 5)}"""
-    comp_symbols = { #Maybe find a better name for this
-        '==' : eq,
-        '!=' : eq, #complement of ==
-        '>=' : ge,
-        '<=' : le,
-        '=': eq, #Alternate to be like yaml_option
-        '<' : ge, #complement of >=
-        '>' : le, #complement of <=
-    }
-
-    reverse_result = False
-
-    #Find the comparator symbol to split the string with and for logs
-    if '==' in args:
-        comparator = '=='
-    elif '!=' in args:
-        comparator = '!='
-        reverse_result = True #complement of == thus reverse by default
-    elif '>=' in args:
-        comparator = '>='
-    elif '<=' in args:
-        comparator = '<='
-    elif '=' in args:
-        comparator = '='
-    elif '<' in args:
-        comparator = '<'
-        reverse_result = True #complement of >=
-    elif '>' in args:
-        comparator = '>'
-        reverse_result = True #complement of <=
-    else:
-        raise  ValueError(f"Could not find a valid comparator in given string '{args}', it must be one of {comp_symbols.keys()}")
-
-    option_name, value = args.split(comparator)
-
-    initial_option_name = str(option_name).strip() #For exception messages
-    option_name = format_to_valid_identifier(option_name)
-
-    # Detect !reversing of result like yaml_option
-    if option_name.startswith('!'):
-        reverse_result = not reverse_result
-        option_name = option_name.lstrip('!')
-        initial_option_name = initial_option_name.lstrip('!')
-
-    value = value.strip()
-
-    option = getattr(world.options, option_name, None)
-    if option is None:
-        raise ValueError(f"YamlCompare could not find an option called '{initial_option_name}' to compare against, its either missing on misspelt")
-
-    if not value: #empty string ''
-        raise ValueError(f"Could not find a valid value to compare against in given string '{args}'. \nThere must be a value to compare against after the comparator (in this case '{comparator}').")
-
-    if not skipCache: #Cache made for optimization purposes
-        cacheindex = option_name + '_' + comp_symbols[comparator].__name__ + '_' + format_to_valid_identifier(value.lower())
-
-        if not hasattr(world, 'yaml_compare_rule_cache'):
-            world.yaml_compare_rule_cache = dict[str,bool]()
-
-    if skipCache or world.yaml_compare_rule_cache.get(cacheindex, None) is None:
+yaml_compare_symbols = { #Maybe find a better name for this
+    '==' : eq,
+    '!=' : eq, #complement of ==
+    '>=' : ge,
+    '<=' : le,
+    '=': eq, #Alternate to be like yaml_option
+    '<' : ge, #complement of >=
+    '>' : le, #complement of <=
+}
+# The order the comparators are looked for in, with whether they're the complement of their operator
+yaml_compare_search_order = (('==', False), ('!=', True), ('>=', False), ('<=', False), ('=', False), ('<', True), ('>', True))
+
+class YamlComparePlan:
+    """The parsed text of a {YamlCompare(OptionName <comparator> value)} call site.\n
+    The value converted for an option class is kept, so evaluating it for a player is just a comparison."""
+    __slots__ = ("args", "option_name", "initial_option_name", "comparator", "operator", "value", "reverse_result", "converted_values")
+
+    def __init__(self, args: str):
+        self.args = args
+        self.reverse_result = False
+
+        #Find the comparator symbol to split the string with and for logs
+        for comparator, is_complement in yaml_compare_search_order:
+            if comparator in args:
+                self.comparator = comparator
+                self.reverse_result = is_complement
+                break
+        else:
+            raise  ValueError(f"Could not find a valid comparator in given string '{args}', it must be one of {yaml_compare_symbols.keys()}")
+        self.operator = yaml_compare_symbols[self.comparator]
+
+        option_name, value = args.split(self.comparator)
+
+        self.initial_option_name = str(option_name).strip() #For exception messages
+        self.option_name = format_to_valid_identifier(option_name)
+
+        # Detect !reversing of result like yaml_option
+        if self.option_name.startswith('!'):
+            self.reverse_result = not self.reverse_result
+            self.option_name = self.option_name.lstrip('!')
+            self.initial_option_name = self.initial_option_name.lstrip('!')
+
+        self.value = value.strip()
+        self.converted_values: dict[type, object] = {}
+
+    def convert_value(self, option) -> object:
+        value = self.value
         try:
             if issubclass(type(option), Choice):
                 value = convert_string_to_type(value, str|int)
@@ -570,7 +1657,7 @@ def YamlCompare(world: "ManualWorld", multiworld: MultiWorld, state: CollectionS
                 raise ValueError(f"YamlCompare does not currently support Option of type {type(option)} \nAsk about it in #Manual-dev and it might be added.")
 
         except KeyError as ex:
-            raise ValueError(f"YamlCompare failed to find the requested value in what the \"{initial_option_name}\" option supports.\
+            raise ValueError(f"YamlCompare failed to find the requested value in what the \"{self.initial_option_name}\" option supports.\
                 \nRaw error:\
                 \n\n{type(ex).__name__}:{ex}")
 
@@ -579,17 +1666,36 @@ def YamlCompare(world: "ManualWorld", multiworld: MultiWorld, state: CollectionS
                 \nCaused By:\
                 \n\n{type(ex).__name__}:{ex}")
 
-        if isinstance(value, str) and comp_symbols[comparator].__name__ != 'eq':
-            #At this point if its still a string don't try and compare with strings using > < >= <=
-            raise ValueError(f'YamlCompare can only compare strings with one of the following: {[s for s, v in comp_symbols.items() if v.__name__ == "eq"]} and you tried to do: "{option.value} {comparator} {value}"')
+        return value
+
+    def evaluate(self, world: "ManualWorld", skipCache: bool = False) -> bool:
+        option = getattr(world.options, self.option_name, None)
+        if option is None:
+            raise ValueError(f"YamlCompare could not find an option called '{self.initial_option_name}' to compare against, its either missing on misspelt")
 
-        result = comp_symbols[comparator](option.value, value)
+        if not self.value: #empty string ''
+            raise ValueError(f"Could not find a valid value to compare against in given string '{self.args}'. \nThere must be a value to compare against after the comparator (in this case '{self.comparator}').")
 
-        if not skipCache:
-            world.yaml_compare_rule_cache[cacheindex] = result
+        if skipCache or type(option) not in self.converted_values:
+            value = self.convert_value(option)
+            if isinstance(value, str) and self.operator.__name__ != 'eq':
+                #At this point if its still a string don't try and compare with strings using > < >= <=
+                raise ValueError(f'YamlCompare can only compare strings with one of the following: {[s for s, v in yaml_compare_symbols.items() if v.__name__ == "eq"]} and you tried to do: "{option.value} {self.comparator} {value}"')
+            if not skipCache:
+                self.converted_values[type(option)] = value
+        else:
+            value = self.converted_values[type(option)]
 
-    else: #if exists and not skipCache
-        result = world.yaml_compare_rule_cache[cacheindex]
+        result = self.operator(option.value, value)
+        return not result if self.reverse_result else result
 
-    return not result if reverse_result else result
+@lru_cache(maxsize=None)
+def parse_yaml_compare(args: str) -> YamlComparePlan:
+    return YamlComparePlan(args)
 
+def YamlCompare(world: "ManualWorld", multiworld: MultiWorld, state: CollectionState, player: int, args: str, skipCache: bool = False) -> bool:
+    """Is a yaml option's value compared using {comparator} to the requested value
+    \nFormat it like {YamlCompare(OptionName==value)}
+    \nWhere == can be any of the following: ==, !=, >=, <=, <, >
+    \nExample: {YamlCompare(Example_Range > 5)}"""
+    return parse_yaml_compare(args).evaluate(world, skipCache)
@@ -4,6 +4,7 @@ import os
 import json
 from typing import Callable, Optional, Counter
 import webbrowser
+import weakref
 
 import Utils
 from worlds.generic.Rules import forbid_items_for_player
@@ -13,14 +14,15 @@ from .Data import item_table, location_table, region_table, category_table
 from .Game import game_name, filler_item_name, starting_items
 from .Meta import world_description, world_webworld, enable_region_diagram
 from .Locations import location_id_to_name, location_name_to_id, location_name_to_location, location_name_groups, victory_names
-from .Items import item_id_to_name, item_name_to_id, item_name_to_item, item_name_groups
+from .Items import item_id_to_name, item_name_to_id, item_name_to_item, item_name_groups, category_name_to_item_names, item_name_to_state_deltas, item_name_to_ordinal
 from .DataValidation import runGenerationDataValidation, runPreFillDataValidation
 
 from .Regions import create_regions
 from .Items import ManualItem
-from .Rules import set_rules
+from .Rules import set_rules, get_manual_progress, RequiresCompiler, save_generated_rules
 from .Options import manual_options_data
-from .Helpers import is_item_enabled, get_option_value, get_items_for_player, resolve_yaml_option, format_state_prog_items_key, ProgItemsCat
+from .Helpers import get_option_value, get_items_for_player, resolve_yaml_option, ItemCounts, is_passthrough_hook, is_noop_hook, \
+    GenerationPlan, build_generation_plan, get_generation_plan_key, get_generation_plan_option_names
 
 from BaseClasses import CollectionState, ItemClassification, Item
 from Options import PerGameCommonOptions
@@ -34,9 +36,15 @@ from .hooks.World import \
     before_generate_basic, after_generate_basic, \
     before_fill_slot_data, after_fill_slot_data, before_write_spoiler, \
     before_extend_hint_information, after_extend_hint_information, \
-    after_collect_item, after_remove_item
+    after_collect_item, after_remove_item, generation_plan_options
 from .hooks.Data import hook_interpret_slot_data
 
+# create_items_bulk only goes through create_item for every copy when one of the item creation hooks does something
+item_creation_hooks_overridden = not (is_passthrough_hook(before_create_item) and is_passthrough_hook(after_create_item))
+
+# The memoized rule results only follow the items collected or removed, anything these hooks change in the state could make them stale
+collect_hooks_overridden = not (is_noop_hook(after_collect_item) and is_noop_hook(after_remove_item))
+
 class ManualWorld(World):
     __doc__ = world_description
     game: str = game_name
@@ -55,13 +63,27 @@ class ManualWorld(World):
     item_name_to_id = item_name_to_id
     item_name_to_item = item_name_to_item
     item_name_groups = item_name_groups
+    category_name_to_item_names = category_name_to_item_names
+    item_name_to_state_deltas = item_name_to_state_deltas
+    item_name_to_ordinal = item_name_to_ordinal
 
     filler_item_name = filler_item_name
 
     item_counts: dict[int, Counter[str]] = {}
     item_counts_progression: dict[int, Counter[str]] = {}
+    requires_compiler: Optional[RequiresCompiler] = None
     start_inventory = {}
 
+    # Generation plans of the current multiworld by plan key, so players with the same plan options only build it once
+    generation_plans: dict[tuple, GenerationPlan] = {}
+    generation_plans_multiworld: Optional[weakref.ref] = None
+    generation_plan_option_names: Optional[list[str]] = None
+    generation_plans_max = 16
+
+    # The item pool adjust_filler_items last returned and its size
+    filler_adjusted_pool: Optional[list[Item]] = None
+    filler_adjusted_pool_size = 0
+
     location_id_to_name = location_id_to_name
     location_name_to_id = location_name_to_id
     location_name_to_location = location_name_to_location
@@ -92,6 +114,30 @@ class ManualWorld(World):
     def stage_assert_generate(cls, multiworld) -> None:
         runGenerationDataValidation(cls)
 
+    @classmethod
+    def stage_set_rules(cls, multiworld) -> None:
+        # Once every player's rules are compiled, so the generated rules cache is written once per generation
+        save_generated_rules()
+
+    def get_generation_plan(self) -> GenerationPlan:
+        """Get the yaml_option filtered items and locations of this player, shared with the other players
+        of the multiworld that have the same values for the options in the plan key"""
+        cls = ManualWorld
+        if cls.generation_plans_multiworld is None or cls.generation_plans_multiworld() is not self.multiworld:
+            cls.generation_plans.clear()
+            cls.generation_plans_multiworld = weakref.ref(self.multiworld)
+        if cls.generation_plan_option_names is None:
+            cls.generation_plan_option_names = get_generation_plan_option_names(generation_plan_options)
+
+        key = get_generation_plan_key(self.multiworld, self.player, cls.generation_plan_option_names)
+        plan = cls.generation_plans.get(key)
+        if plan is None:
+            plan = build_generation_plan(self)
+            if len(cls.generation_plans) >= cls.generation_plans_max:
+                del cls.generation_plans[next(iter(cls.generation_plans))]
+            cls.generation_plans[key] = plan
+        return plan
+
 
     def create_regions(self):
         before_create_regions(self, self.multiworld, self.player)
@@ -112,25 +158,10 @@ class ManualWorld(World):
     def create_items(self):
         # Generate item pool
         pool: list[Item] = []
-        traps = []
-        configured_item_names = self.item_id_to_name.copy()
-
-        items_config: dict[str, int|dict[ItemClassification | str | int, int]] = {}
-        for name in configured_item_names.values():
-            if name == "__Victory__": continue
-            if name == filler_item_name: continue # intentionally using the Game.py filler_item_name here because it's a non-Items item
-
-            item = self.item_name_to_item[name]
-            item_count = int(item.get("count", 1))
-
-            if item.get("trap"):
-                traps.append(name)
+        plan = self.get_generation_plan()
+        traps = list(plan.traps)
 
-            if "category" in item:
-                if not is_item_enabled(self.multiworld, self.player, item):
-                    item_count = 0
-
-            items_config[name] = item_count
+        items_config: dict[str, int|dict[ItemClassification | str | int, int]] = dict(plan.items_config)
 
         items_config = before_create_items_all(items_config, self, self.multiworld, self.player)
 
@@ -138,9 +169,7 @@ class ManualWorld(World):
             total_created = 0
             if type(configs) is int:
                 total_created = configs
-                for _ in range(configs):
-                    new_item = self.create_item(name)
-                    pool.append(new_item)
+                pool.extend(self.create_items_bulk(name, configs))
             elif type(configs) is dict:
                 for cat, count in configs.items():
                     total_created += count
@@ -157,9 +186,7 @@ class ManualWorld(World):
                         except Exception as ex:
                             raise Exception(f"Item override '{cat}' for {name} improperly defined\n\n{type(ex).__name__}:{ex}")
 
-                    for _ in range(count):
-                        new_item = self.create_item(name, true_class)
-                        pool.append(new_item)
+                    pool.extend(self.create_items_bulk(name, count, true_class))
             else:
                 raise Exception(f"Item override for {name} improperly defined")
 
@@ -251,18 +278,7 @@ class ManualWorld(World):
         if class_override is not None:
             classification = class_override
         else:
-            classification = ItemClassification.filler
-
-            if "trap" in item and item["trap"]:
-                classification |= ItemClassification.trap
-
-            if "useful" in item and item["useful"]:
-                classification |= ItemClassification.useful
-
-            if "progression_skip_balancing" in item and item["progression_skip_balancing"]:
-                classification |= ItemClassification.progression_skip_balancing
-            elif "progression" in item and item["progression"]:
-                classification |= ItemClassification.progression
+            classification = self.get_item_classification(item)
 
         item_object = ManualItem(name, classification,
                         self.item_name_to_id[name], player=self.player)
@@ -271,25 +287,83 @@ class ManualWorld(World):
 
         return item_object
 
-    # Item Value need a tweaked collect and remove:
+    def create_items_bulk(self, name: str, count: int, class_override: Optional['ItemClassification']=None) -> list[Item]:
+        """Create count copies of an item, same as calling create_item count times but only looking up
+        the item's classification and id once, and skipping the item creation hooks when they do nothing"""
+        if count <= 0:
+            return []
+        if item_creation_hooks_overridden:
+            return [self.create_item(name, class_override) for _ in range(count)]
+
+        item = self.item_name_to_item[name]
+        classification = class_override if class_override is not None else self.get_item_classification(item)
+        item_id = self.item_name_to_id[name]
+        return [ManualItem(name, classification, item_id, player=self.player) for _ in range(count)]
+
+    def get_item_classification(self, item: dict) -> ItemClassification:
+        classification = ItemClassification.filler
+
+        if "trap" in item and item["trap"]:
+            classification |= ItemClassification.trap
+
+        if "useful" in item and item["useful"]:
+            classification |= ItemClassification.useful
+
+        if "progression_skip_balancing" in item and item["progression_skip_balancing"]:
+            classification |= ItemClassification.progression_skip_balancing
+        elif "progression" in item and item["progression"]:
+            classification |= ItemClassification.progression
+
+        return classification
+
+    # Item Value, the category totals and the ManualProgress used by the rules need a tweaked collect and remove:
     def collect(self, state: CollectionState, item: Item) -> bool:
         change = super().collect(state, item)
-        manual_item = self.item_name_to_item.get(item.name, {})
-        if change and manual_item.get("value"):
-            for key, value in manual_item["value"].items():
-                state.prog_items[item.player][format_state_prog_items_key(ProgItemsCat.VALUE, key)] += int(value)
+        if change:
+            state.manual_reachable_locations.pop(item.player, None)
+            deltas = self.item_name_to_state_deltas.get(item.name)
+            if deltas is not None:
+                prog_items = state.prog_items[item.player]
+                for key, delta in deltas:
+                    prog_items[key] += delta
+            ordinal = self.item_name_to_ordinal.get(item.name)
+            if ordinal is not None:
+                progress = get_manual_progress(state, item.player, len(self.item_name_to_ordinal))
+                progress.collect(ordinal)
+                if progress.memo:
+                    progress.forget(self.requires_compiler.dependents[ordinal])
         after_collect_item(self, state, change, item)
+        if collect_hooks_overridden:
+            self.forget_memoized_rules(state, item.player)
         return change
 
     def remove(self, state: CollectionState, item: Item) -> bool:
         change = super().remove(state, item)
-        manual_item = self.item_name_to_item.get(item.name, {})
-        if change and manual_item.get("value"):
-            for key, value in manual_item["value"].items():
-                state.prog_items[item.player][format_state_prog_items_key(ProgItemsCat.VALUE, key)] -= int(value)
+        if change:
+            state.manual_reachable_locations.pop(item.player, None)
+            deltas = self.item_name_to_state_deltas.get(item.name)
+            if deltas is not None:
+                prog_items = state.prog_items[item.player]
+                for key, delta in deltas:
+                    prog_items[key] -= delta
+            ordinal = self.item_name_to_ordinal.get(item.name)
+            if ordinal is not None:
+                progress = get_manual_progress(state, item.player, len(self.item_name_to_ordinal))
+                progress.remove(ordinal)
+                if progress.memo:
+                    progress.forget(self.requires_compiler.dependents[ordinal])
         after_remove_item(self, state, change, item)
+        if collect_hooks_overridden:
+            self.forget_memoized_rules(state, item.player)
         return change
 
+    def forget_memoized_rules(self, state: CollectionState, player: int):
+        """Drop every memoized rule result and reachable location of player in state"""
+        state.manual_reachable_locations.pop(player, None)
+        progress = state.manual_progress.get(player)
+        if progress is not None:
+            progress.memo.clear()
+
     def set_rules(self):
         before_set_rules(self, self.multiworld, self.player)
 
@@ -396,6 +470,9 @@ class ManualWorld(World):
         with open(os.path.join(output_directory, filename), 'wb') as f:
             f.write(b64encode(bytes(json.dumps(data), 'utf-8')))
 
+        if self.requires_compiler is not None and self.requires_compiler.profiler is not None:
+            self.requires_compiler.profiler.write_report(output_directory, f"{self.multiworld.get_out_file_name_base(self.player)}_rules_profile")
+
     def write_spoiler(self, spoiler_handle):
         before_write_spoiler(self, self.multiworld, spoiler_handle)
 
@@ -421,11 +498,31 @@ class ManualWorld(World):
     The maximum time a location/region's requirement can loop to check for functions\n
     One thing to remember is the more you loop the longer generation will take. So probably leave it as is unless you really needs it."""
 
+    location_rules_rely_on_region: bool = True
+    """Default: True\n
+    Only attach a location's own requires to it, since Archipelago checks that a location's region can be reached before reading its access rule,
+    and every entrance of that region already checks the region's requires.\n
+    Set it to False to check the region's requires again inside every location rule."""
+
+    rules_code_generation: bool = False
+    """Default: False\n
+    Turn every compiled location/region requires into a flat Python function instead of walking the compiled tree on every check.\n
+    The generated code is cached in Archipelago's cache folder, keyed by locations.json and regions.json, so it only gets compiled once per data version."""
+
+    rules_profiling: bool = False
+    """Default: False\n
+    Record how many times each location, region and entrance rule and each requires function gets called, how long it takes and how often it's true.\n
+    The report gets written next to the spoiler as a .json and a .csv, sorted by total time. It slows down generation, so only use it to investigate."""
+
     def add_filler_items(self, item_pool, traps):
         Utils.deprecate("Use adjust_filler_items instead.")
         return self.adjust_filler_items(item_pool, traps)
 
     def adjust_filler_items(self, item_pool, traps):
+        # The hooks can adjust the pool before create_items does, skip the second adjustment if the pool didn't change since
+        if item_pool is self.filler_adjusted_pool and len(item_pool) == self.filler_adjusted_pool_size:
+            return item_pool
+
         extras = len(self.multiworld.get_unfilled_locations(player=self.player)) - len(item_pool)
 
         if extras > 0:
@@ -448,35 +545,61 @@ class ManualWorld(World):
             # Filler is only assigned if the item doesn't have any other tags, so it only has to be covered by itself.
             # Skip Balancing is also not covered due to how it's only supported when paired with Progression.
             # As a result, these cover every possible combination can be removed.
-            fillers = [item for item in item_pool if item.classification == ItemClassification.filler]
-            traps = [item for item in item_pool if item.classification == ItemClassification.trap]
-            useful = [item for item in item_pool if item.classification == ItemClassification.useful]
+            fillers = []
+            traps = []
+            useful = []
             # Useful + Trap is classified separately so that it can have a unique priority ranking.
-            useful_traps = [item for item in item_pool if
-                            ItemClassification.progression not in item.classification
-                            and ItemClassification.useful in item.classification
-                            and ItemClassification.trap in item.classification]
+            useful_traps = []
+            for item in item_pool:
+                if item.classification == ItemClassification.filler:
+                    fillers.append(item)
+                elif item.classification == ItemClassification.trap:
+                    traps.append(item)
+                elif item.classification == ItemClassification.useful:
+                    useful.append(item)
+                elif (ItemClassification.progression not in item.classification
+                        and ItemClassification.useful in item.classification
+                        and ItemClassification.trap in item.classification):
+                    useful_traps.append(item)
             self.random.shuffle(fillers)
             self.random.shuffle(traps)
             self.random.shuffle(useful)
             self.random.shuffle(useful_traps)
+            # Items compare by name and player, so like list.remove every removal takes out the first equal item left in the pool
+            removed: Counter[Item] = Counter()
             for _ in range(0, abs(extras)):
-                popped = None
                 if fillers:
-                    popped = fillers.pop()
+                    removed[fillers.pop()] += 1
                 elif traps:
-                    popped = traps.pop()
+                    removed[traps.pop()] += 1
                 elif useful:
-                    popped = useful.pop()
+                    removed[useful.pop()] += 1
                 elif useful_traps:
-                    popped = useful_traps.pop()
+                    removed[useful_traps.pop()] += 1
                 else:
                     logging.warning("Could not remove enough non-progression items from the pool.")
                     break
-                item_pool.remove(popped)
 
+            kept = []
+            for item in item_pool:
+                if removed[item]:
+                    removed[item] -= 1
+                else:
+                    kept.append(item)
+            item_pool[:] = kept
+
+        self.filler_adjusted_pool = item_pool
+        self.filler_adjusted_pool_size = len(item_pool)
         return item_pool
 
+    def rules_depending_on(self, item_name: str) -> list[tuple[str, str]]:
+        """Returns the (kind, name) of the regions, entrances and locations whose requires mention the item.\n
+        Prefix a category name with @ to get the ones that mention the category.
+        Requires functions can't be looked into, and this only works after set_rules, before then an empty list is returned."""
+        if self.requires_compiler is None:
+            return []
+        return self.requires_compiler.get_rules_depending_on(item_name)
+
     def get_item_counts(self, player: Optional[int] = None, pool: list[Item] | None | bool = None, only_progression: bool = False) -> Counter[str]:
         """Returns the player real item counts.\n
         If you provide an item pool using the pool argument, then it's item counts will be returned.
@@ -492,7 +615,7 @@ class ManualWorld(World):
             pool = None
 
         if pool is not None:
-            return Counter([i.name for i in pool if not only_progression or i.advancement])
+            return ItemCounts([i.name for i in pool if not only_progression or i.advancement])
 
         if only_progression:
             return self.item_counts_progression.get(player, Counter())
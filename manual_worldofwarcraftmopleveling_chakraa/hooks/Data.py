@@ -1,3 +1,5 @@
+import re
+
 # called after the game.json file has been loaded
 def after_load_game_file(game_table: dict) -> dict:
     return game_table
@@ -14,6 +16,12 @@ def after_load_progressive_item_file(progressive_item_table: list) -> list:
 # called after the locations.json file has been loaded, before any location loading or processing has occurred
 # if you need access to the locations after processing to add ids, etc., you should use the hooks in World.py
 def after_load_location_file(location_table: list) -> list:
+    # Parse the level of the "Level N" locations once, so the goal can trim them in World.py without going through their names again
+    for location in location_table:
+        if "level" not in location:
+            level_match = re.search(r"Level (\d+)", location["name"])
+            if level_match:
+                location["level"] = int(level_match.group(1))
     return location_table
 
 # called after the locations.json file has been loaded, before any location loading or processing has occurred
@@ -16,7 +16,8 @@ from ..Data import game_table, item_table, location_table, region_table
 from ..Helpers import is_option_enabled, get_option_value, format_state_prog_items_key, ProgItemsCat
 
 # calling logging.info("message") anywhere below in this file will output the message to both console and log file
-import logging, re
+import logging
+from bisect import bisect_right
 
 ########################################################################################
 ## Order of method calls when the world generates:
@@ -32,56 +33,62 @@ import logging, re
 
 
 
+# Players with the same values for these options, and for the ones used as yaml_option in the json files, share their generation plan
+# (the items and locations enabled by yaml options). Add the options your before_is_*_enabled hooks read here.
+generation_plan_options = ["goal", "faction", "level_items", "xp_rate_items"]
+
 # Use this function to change the valid filler items to be created to replace item links or starting items.
 # Default value is the `filler_item_name` from game.json
 def hook_get_filler_item_name(world: World, multiworld: MultiWorld, player: int) -> str | bool:
     return False
 
+# Map numeric values of the goal option to expansion names and max levels
+expansion_map = {
+    0: ("Vanilla", 60),
+    1: ("The Burning Crusade", 70),
+    2: ("Wrath of the Lich King", 80),
+    3: ("Cataclysm", 85),
+    4: ("Mists of Pandaria", 90),
+}
+
 # Called before regions and locations are created. Not clear why you'd want this, but it's here. Victory location is included, but Victory event is not placed yet.
 def before_create_regions(world: World, multiworld: MultiWorld, player: int):
     pass
 
+# Region name -> (sorted levels, location names in the same order) of the locations with a level, parsed in hooks/Data.py
+# Built on the first call, once locations.json is fully loaded
+locations_by_region_level: dict[str, tuple[list[int], list[str]]] = {}
+
+def get_locations_by_region_level() -> dict[str, tuple[list[int], list[str]]]:
+    if not locations_by_region_level:
+        region_levels: dict[str, list[tuple[int, str]]] = {}
+        for location in location_table:
+            if "level" in location:
+                region_levels.setdefault(location.get("region", "Manual"), []).append((location["level"], location["name"]))
+        for region_name, levels in region_levels.items():
+            levels.sort(key=lambda level: level[0])
+            locations_by_region_level[region_name] = ([level for level, _ in levels], [name for _, name in levels])
+    return locations_by_region_level
+
 # Called after regions and locations are created, in case you want to see or modify that information. Victory location is included.
 def after_create_regions(world: World, multiworld: MultiWorld, player: int):
     expansion = get_option_value(multiworld, player, "goal")
 
-    # Map numeric values to expansion names and max levels
-    expansion_map = {
-        0: ("Vanilla", 60),
-        1: ("The Burning Crusade", 70),
-        2: ("Wrath of the Lich King", 80),
-        3: ("Cataclysm", 85),
-        4: ("Mists of Pandaria", 90),
-    }
-
     if expansion not in expansion_map:
         raise ValueError(f"Invalid expansion value '{expansion}'.")
 
     _, max_level = expansion_map[expansion]  # Only unpack max_level since expansion_name is unused
 
-    locations_to_remove = []
-
-    for location_data in location_table:  # Iterate through all locations
-        location_name = location_data["name"]
-
-        # Extract level from location name
-        level_match = re.search(r"Level (\d+)", location_name)
-        if level_match:
-            level = int(level_match.group(1))
-            if level > max_level:
-                locations_to_remove.append(location_name)
-
-    # Remove locations from regions
-    for region in multiworld.regions:
-        if region.player == player:
-            region.locations = [
-                location for location in region.locations
-                if location.name not in locations_to_remove
-            ]
+    # Remove the locations above the goal's max level, only touching the regions that have some
+    for region_name, (levels, location_names) in get_locations_by_region_level().items():
+        cut = bisect_right(levels, max_level)
+        if cut == len(levels):
+            continue
 
-    # Clear location cache if applicable
-    if hasattr(multiworld, "clear_location_cache"):
-        multiworld.clear_location_cache()
+        locations_to_remove = set(location_names[cut:])
+        region = multiworld.get_region(region_name, player)
+        for location in [location for location in region.locations if location.name in locations_to_remove]:
+            region.locations.remove(location)  # The region's location register also drops it from the player's location lookup
 
 # This hook allows you to access the item names & counts before the items are created. Use this to increase/decrease the amount of a specific item in the pool
 # Valid item_config key/values:
@@ -98,6 +105,26 @@ def before_create_items_all(item_config: dict[str, int|dict], world: World, mult
 def before_create_items_starting(item_pool: list, world: World, multiworld: MultiWorld, player: int) -> list:
     return item_pool
 
+# Items of these categories are only kept when they also belong to one of the expansions allowed by the goal
+expansion_gated_categories = frozenset(["Sequential Levels", "Zones", "Dungeons", "Talents"])
+
+# Item name -> (set of its categories, is it expansion gated, bitmask of the expansions it belongs to by goal value)
+# Built on the first call, once items.json is fully loaded
+item_filter_index: dict[str, tuple[frozenset[str], bool, int]] = {}
+
+def get_item_filter_index() -> dict[str, tuple[frozenset[str], bool, int]]:
+    if not item_filter_index:
+        for item in item_table:
+            if item["name"] in item_filter_index:  # Only the first definition of a name is used
+                continue
+            item_categories = frozenset(item.get("category", []))
+            expansion_mask = 0
+            for goal, (expansion_name, _) in expansion_map.items():
+                if expansion_name in item_categories:
+                    expansion_mask |= 1 << goal
+            item_filter_index[item["name"]] = (item_categories, not item_categories.isdisjoint(expansion_gated_categories), expansion_mask)
+    return item_filter_index
+
 # The item pool after starting items are processed but before filler is added, in case you want to see the raw item pool at that stage
 def before_create_items_filler(item_pool: list, world: World, multiworld: MultiWorld, player: int) -> list:
     # Get player options
@@ -106,20 +133,12 @@ def before_create_items_filler(item_pool: list, world: World, multiworld: MultiW
     expansion = get_option_value(multiworld, player, "goal")
     xpitems = get_option_value(multiworld, player, "xp_rate_items")
 
-    # Map numeric values to expansion names and max levels
-    expansion_map = {
-        0: ("Vanilla", 60),
-        1: ("The Burning Crusade", 70),
-        2: ("Wrath of the Lich King", 80),
-        3: ("Cataclysm", 85),
-        4: ("Mists of Pandaria", 90),
-    }
-
     if expansion not in expansion_map:
         raise ValueError(f"Invalid expansion value '{expansion}'.")
 
-    allowed_expansions = [name for name, _ in list(expansion_map.values())[:expansion + 1]]
-    skipped_expansions = len(expansion_map) - len(allowed_expansions)
+    allowed_expansions_mask = (1 << (expansion + 1)) - 1  # The goal's expansion and every one before it
+    skipped_expansions = len(expansion_map) - (expansion + 1)
+    item_index = get_item_filter_index()
 
     # Initialize counters and lists
     progressive_levels_removed = 0
@@ -128,11 +147,11 @@ def before_create_items_filler(item_pool: list, world: World, multiworld: MultiW
     faction_item_precollected = False
 
     for item in item_pool:
-        item_table_element = next((i for i in item_table if i["name"] == item.name), None)
-        if not item_table_element:
+        item_filter = item_index.get(item.name)
+        if item_filter is None:
             continue
 
-        item_categories = item_table_element.get("category", [])
+        item_categories, expansion_gated, expansion_mask = item_filter
 
         # Handle "Class" and "Faction" items
         if "Class" in item_categories:
@@ -167,9 +186,8 @@ def before_create_items_filler(item_pool: list, world: World, multiworld: MultiW
             xp_rate_items_kept += 1  # Increment the count of kept items
 
         # Remove items not in allowed expansions (for expansion-affected categories)
-        if any(category in item_categories for category in ["Sequential Levels", "Zones", "Dungeons", "Talents"]):
-            if not any(expansion in item_categories for expansion in allowed_expansions):
-                continue
+        if expansion_gated and not expansion_mask & allowed_expansions_mask:
+            continue
 
         # Keep the item if no removal condition is met
         items_to_keep.append(item)
@@ -236,6 +254,7 @@ def after_generate_basic(world: World, multiworld: MultiWorld, player: int):
 
 # This method is run every time an item is added to the state, can be used to modify the value of an item.
 # IMPORTANT! Any changes made in this hook must be cancelled/undone in after_remove_item
+# Once this hook or after_remove_item does anything, the memoized rule results get cleared on every collect/remove, which slows down fill
 def after_collect_item(world: World, state: CollectionState, Changed: bool, item: Item):
     # the following let you add to the Potato Item Value count
     # if item.name == "Cooked Potato":
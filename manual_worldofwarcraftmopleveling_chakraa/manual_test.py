@@ -1,6 +1,73 @@
+from unittest.mock import patch
+
+from BaseClasses import CollectionState, MultiWorld
+from test.general import setup_solo_multiworld
 from test.TestBase import WorldTestBase
 from .Game import game_name
+from .Rules import RequiresCompiler
 
 
 class ManualTest(WorldTestBase):
     game = game_name
+
+    def test_location_rules_relying_on_region(self):
+        """Only attaching the location's own requires must give the same reachability as also checking its region's requires"""
+        world = self.multiworld.worlds[self.player]
+        self.assertTrue(world.location_rules_rely_on_region)
+
+        # A second multiworld with the same seed, generated with the location rules checking their region's requires too
+        with patch.object(type(world), "location_rules_rely_on_region", False):
+            checking_region_multiworld = setup_solo_multiworld(type(world), seed=self.multiworld.seed)
+
+        def reachable_locations_per_item(multiworld: MultiWorld, player: int) -> list[set[str]]:
+            progression_items = sorted((item for item in multiworld.itempool if item.player == player and item.advancement),
+                                       key=lambda item: item.name)
+            state = CollectionState(multiworld)
+            reachable = []
+            for item in progression_items:
+                state.collect(item, True)
+                reachable.append({location.name for location in multiworld.get_locations(player) if location.can_reach(state)})
+            return reachable
+
+        self.assertEqual(reachable_locations_per_item(self.multiworld, self.player),
+                         reachable_locations_per_item(checking_region_multiworld, 1))
+
+    def test_requires_list_form(self):
+        """Pin the semantics of the dict/list form of requires: every plain entry is needed,
+        unless every item of one of the {"or": [...]}/[...] groups is collected"""
+        world = self.multiworld.worlds[self.player]
+        item_a, item_b, item_c = sorted(item["name"] for item in world.item_table if item.get("progression"))[:3]
+        compiler = RequiresCompiler(world, self.multiworld, self.player)
+
+        cases = [
+            # requires, collected items, expected
+            ([], [], True),
+            ([item_a], [], False),
+            ([item_a], [item_a], True),
+            ([f"{item_a}:2"], [item_a], False),
+            ([f"{item_a}:2"], [item_a, item_a], True),
+            ([f"{item_a}:0"], [], True),
+            ([item_a, item_b], [item_a], False),
+            ([item_a, item_b], [item_a, item_b], True),
+            ([[item_a, item_b]], [], True),  # a group without plain entries never blocks anything
+            ([[item_a, item_b], item_c], [item_c], True),
+            ([[item_a, item_b], item_c], [item_a], False),
+            ([[item_a, item_b], item_c], [item_a, item_b], True),  # a complete group overrides the missing plain entries
+            ([{"or": [item_a, item_b]}, item_c], [item_a], False),
+            ([{"or": [item_a, item_b]}, item_c], [item_a, item_b], True),
+            ([{"or": [f"{item_a}:2"]}, item_c], [item_a], False),
+            ([{"or": []}, item_c], [], True),  # so does an empty group
+            ([item_c, {"or": [item_a]}, item_b], [item_a], True),
+            ([item_c, {"or": [item_a]}, [item_b]], [item_c], True),
+        ]
+
+        for requires, collected, expected in cases:
+            with self.subTest(requires=requires, collected=collected):
+                state = CollectionState(self.multiworld)
+                for item_name in collected:
+                    state.collect(world.create_item(item_name), True)
+                rule = compiler.make_rule(compiler.compile_list(requires, {"name": "test", "requires": requires}))
+                self.assertEqual(rule(state), expected)
+
+        with self.assertRaises(ValueError):
+            compiler.compile_list([f"{item_a}:many"], {"name": "test", "requires": []})